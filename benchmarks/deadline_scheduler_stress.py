@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+# Stress test for external-scripts/deadline_scheduler.py: fire a storm of synthetic PIR IRQs
+# and compare the shared scheduler with the old "cancel the threading.Timer and start a new one" pattern.
+#
+# Every IRQ extends the motion persistence of one of the sensors, exactly like processIRQ in pir-mqtt-agent.py.
+# Checked for both implementations:
+#  * threads created during the storm (just the scheduler thread itself, against one per IRQ for the timers)
+#  * time spent in schedule() per IRQ, i.e. in the IRQ handler
+#  * a "quiet" callback never runs before the last IRQ of its sensor + persistence
+#  * every sensor goes quiet exactly once per motion period
+#
+# Run with: python3 benchmarks/deadline_scheduler_stress.py [--irqs 10000]
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'external-scripts'))
+from deadline_scheduler import DeadlineScheduler
+
+_now = getattr(time, 'monotonic', time.time)
+
+
+class TimerChurn(object):
+    """ The previous implementation: one threading.Timer per IRQ """
+
+    def __init__(self):
+        self.timers = {}
+        self.lock = threading.Lock()
+
+    def schedule(self, key, delay, callback, *args):
+        with self.lock:
+            previous = self.timers.get(key)
+            if previous:
+                previous.cancel()
+            timer = threading.Timer(delay, self._run, (key, callback, args))
+            self.timers[key] = timer
+            timer.start()
+            return previous is not None
+
+    def _run(self, key, callback, args):
+        with self.lock:
+            if self.timers.get(key) is not threading.current_thread():
+                # cancelled and replaced after it fired
+                return
+            del self.timers[key]
+        callback(*args)
+
+
+""" Fire the IRQs and return the measurements """
+
+
+def runStorm(scheduler, irqs, sensors, persistence, maxGap, pauses, seed):
+    random.seed(seed)
+    lock = threading.Lock()
+    lastIrq = {}
+    quiet = []
+    early = []
+    lateness = []
+
+    def stopMotion(sensor, deadline):
+        now = _now()
+        with lock:
+            # a later IRQ must have pushed the deadline out
+            if now < lastIrq[sensor] + persistence:
+                early.append(sensor)
+            lateness.append(now - deadline)
+            quiet.append(sensor)
+
+    threadsBefore = threading.active_count()
+    created = [0]
+    originalStart = threading.Thread.start
+
+    def countingStart(thread):
+        created[0] += 1
+        return originalStart(thread)
+
+    threading.Thread.start = countingStart
+    peakThreads = threadsBefore
+    scheduleTime = 0
+    periods = 0
+    try:
+        for i in range(irqs):
+            sensor = random.randrange(sensors)
+            with lock:
+                now = _now()
+                if sensor not in lastIrq or now >= lastIrq[sensor] + persistence:
+                    periods += 1
+                lastIrq[sensor] = now
+            scheduler.schedule(('motion', sensor), persistence, stopMotion, sensor, now + persistence)
+            scheduleTime += _now() - now
+            peakThreads = max(peakThreads, threading.active_count())
+            if random.random() < pauses:
+                # the room goes quiet for a while
+                time.sleep(persistence * 2)
+            elif maxGap:
+                time.sleep(random.uniform(0, maxGap))
+    finally:
+        threading.Thread.start = originalStart
+
+    # let the last deadlines run out
+    time.sleep(persistence * 3 + 0.5)
+    return {
+        'scheduleTime': scheduleTime,
+        'created': created[0],
+        'peakThreads': peakThreads - threadsBefore,
+        'quiet': len(quiet),
+        'periods': periods,
+        'early': len(early),
+        'maxLateness': max(lateness) if lateness else 0,
+    }
+
+
+def report(name, result, irqs):
+    print("%-18s %8.1f us/IRQ  threads created %6d  peak extra threads %5d  quiet %5d/%-5d  early %d  max lateness %.1f ms" % (
+        name, result['scheduleTime'] / irqs * 1e6, result['created'], result['peakThreads'],
+        result['quiet'], result['periods'], result['early'], result['maxLateness'] * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fire synthetic PIR IRQs at the deadline scheduler")
+    parser.add_argument('--irqs', type=int, default=10000)
+    parser.add_argument('--sensors', type=int, default=4)
+    parser.add_argument('--persistence', type=float, default=0.05, help="motion persistence in seconds")
+    parser.add_argument('--max-gap', type=float, default=0.0002, help="maximum time between IRQs in seconds")
+    parser.add_argument('--pauses', type=float, default=0.005, help="chance of a quiet pause after each IRQ")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-timers', action='store_true', help="skip the threading.Timer comparison")
+    args = parser.parse_args()
+
+    results = [('DeadlineScheduler', runStorm(DeadlineScheduler(), args.irqs, args.sensors, args.persistence,
+                                              args.max_gap, args.pauses, args.seed))]
+    if not args.no_timers:
+        results.append(('threading.Timer', runStorm(TimerChurn(), args.irqs, args.sensors, args.persistence,
+                                                    args.max_gap, args.pauses, args.seed)))
+    for name, result in results:
+        report(name, result, args.irqs)
+
+    failed = False
+    scheduler = results[0][1]
+    # the scheduler thread itself is started lazily on the first deadline
+    if scheduler['created'] > 1:
+        print("FAIL: the scheduler created %d threads" % scheduler['created'])
+        failed = True
+    for name, result in results:
+        if result['early']:
+            print("FAIL: %s went quiet %d times before the persistence ran out" % (name, result['early']))
+            failed = True
+        if result['quiet'] != result['periods']:
+            print("FAIL: %s went quiet %d times for %d motion periods" % (name, result['quiet'], result['periods']))
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
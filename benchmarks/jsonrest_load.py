@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+import aiohttp
+from aiohttp import web
+
+# Load test for the async path of custom_components/sensor/jsonrest.py: poll 100 async sensors
+# against a local HTTP stub which takes --delay seconds to answer every request.
+#
+# Reported per polling round:
+#  * wall time of the round and the requests in flight at once on the stub (bounded by MAX_CONCURRENT_REQUESTS)
+#  * executor jobs in flight at once (only the JSON parsing goes there, the requests don't hold a thread).
+#    The stub always returns the same reply, so from the second round on the sensors skip the parsing
+#  * the worst event loop lag, measured by a ticker task
+#
+# Needs Home Assistant installed (the platform imports it), run with: python3 benchmarks/jsonrest_load.py
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'custom_components', 'sensor'))
+import jsonrest
+
+
+class Hass(object):
+    """ Just enough of Home Assistant for the sensors: an executor, counting the jobs in flight """
+
+    def __init__(self):
+        self.jobs = 0
+        self.maxJobs = 0
+
+    async def async_add_executor_job(self, target, *args):
+        self.jobs += 1
+        self.maxJobs = max(self.maxJobs, self.jobs)
+        try:
+            return await asyncio.get_event_loop().run_in_executor(None, target, *args)
+        finally:
+            self.jobs -= 1
+
+
+async def startStub(delay, size):
+    """ Start the slow HTTP stub, return (runner, base url, stats) """
+    stats = {'inFlight': 0, 'maxInFlight': 0, 'requests': 0}
+    body = json.dumps({'value': 21.5, 'items': [{'id': i, 'name': 'item %d' % i} for i in range(size)]})
+
+    async def handler(request):
+        stats['requests'] += 1
+        stats['inFlight'] += 1
+        stats['maxInFlight'] = max(stats['maxInFlight'], stats['inFlight'])
+        try:
+            await asyncio.sleep(delay)
+            return web.Response(text=body, content_type='application/json')
+        finally:
+            stats['inFlight'] -= 1
+
+    app = web.Application()
+    app.router.add_get('/sensor/{id}', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, 'http://127.0.0.1:%d' % port, stats
+
+
+async def measureLag(lag, stop):
+    """ Record the worst lateness of a 10ms sleep while the sensors poll """
+    while not stop.is_set():
+        start = time.monotonic()
+        await asyncio.sleep(0.01)
+        lag[0] = max(lag[0], time.monotonic() - start - 0.01)
+
+
+async def run(args):
+    runner, url, stats = await startStub(args.delay, args.size)
+    hass = Hass()
+    # every sensor polls on each round, don't let the fetch throttling skip any
+    jsonrest.MIN_TIME_BETWEEN_FETCHES = 0
+    failed = False
+
+    async with aiohttp.ClientSession() as session:
+        with mock.patch.object(jsonrest, 'async_get_clientsession', lambda hass, verify_ssl=True: session):
+            sensors = []
+            for i in range(args.sensors):
+                resource = '%s/sensor/%d' % (url, i)
+                rest = jsonrest.get_rest_data(
+                    'GET', resource, None, None, None, True, timedelta(0),
+                    factory=lambda resource=resource: jsonrest.AsyncJSONRestData(
+                        hass, 'GET', resource, None, None, None, True, timedelta(0)))
+                sensors.append(jsonrest.AsyncJSONRestSensor(hass, rest, 'sensor %d' % i, None, None,
+                                                            args.json_path))
+
+            print("%d sensors, stub delay %.2fs, at most %d requests in flight" % (
+                args.sensors, args.delay, jsonrest.MAX_CONCURRENT_REQUESTS))
+            for i in range(args.rounds):
+                stats['maxInFlight'] = 0
+                hass.maxJobs = 0
+                lag = [0]
+                stop = asyncio.Event()
+                ticker = asyncio.ensure_future(measureLag(lag, stop))
+                start = time.monotonic()
+                await asyncio.gather(*[sensor.async_update() for sensor in sensors])
+                elapsed = time.monotonic() - start
+                threads = threading.active_count()
+                stop.set()
+                await ticker
+
+                missing = [sensor.name for sensor in sensors if sensor.state == jsonrest.STATE_UNKNOWN]
+                print("round %d: %6.2fs  requests in flight %3d  executor jobs in flight %3d  threads %3d  loop lag %6.1f ms  unknown %d" % (
+                    i + 1, elapsed, stats['maxInFlight'], hass.maxJobs, threads, lag[0] * 1000, len(missing)))
+                if missing or stats['maxInFlight'] > jsonrest.MAX_CONCURRENT_REQUESTS:
+                    failed = True
+
+    await runner.cleanup()
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Poll many async jsonrest sensors against a slow local stub")
+    parser.add_argument('--sensors', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--delay', type=float, default=0.5, help="seconds the stub takes to answer")
+    parser.add_argument('--size', type=int, default=1000, help="items in the JSON reply")
+    parser.add_argument('--json-path', default='value', help="json_path of the sensors (empty for the whole reply)")
+    args = parser.parse_args()
+    args.json_path = args.json_path or None
+
+    sys.exit(1 if asyncio.run(run(args)) else 0)
+
+
+if __name__ == '__main__':
+    main()
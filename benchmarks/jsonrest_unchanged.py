@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import timedelta
+
+# Microbenchmark for _data_changed in custom_components/sensor/jsonrest.py: a sensor polled at a high rate
+# on a 1 MB JSON body, timing the processing of every poll (the fetch itself is left out, the data is set
+# on the JSONRestData directly) for:
+#  * unchanged: the same reply object, as kept after a 304 Not Modified
+#  * same body: an equal reply in a new string, as after a 200 with the same contents
+#  * changed: a reply differing in its last value, processed every time
+#  * previous: the sensor before _data_changed, parsing the body on every poll
+#
+# Needs Home Assistant installed (the platform imports it), run with: python3 benchmarks/jsonrest_unchanged.py
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'custom_components', 'sensor'))
+import jsonrest
+
+
+def makeBody(size, last):
+    """ A JSON object of about size bytes, with last as its final value """
+    items = []
+    length = 0
+    while length < size:
+        item = {'id': len(items), 'name': 'item %d' % len(items), 'value': len(items) * 0.5}
+        items.append(item)
+        length += len(json.dumps(item)) + 2
+    return json.dumps({'items': items, 'last': last})
+
+
+def copyOf(text):
+    """ An equal string which is not the same object """
+    return (text + ' ')[:-1]
+
+
+def previousUpdate(sensor, value):
+    """ The processing of the sensor before _data_changed: the body was parsed on every poll """
+    sensor._state = jsonrest.STATE_ON if len(value) >= 255 else value
+    try:
+        attributes = json.loads(value)
+        sensor._attributes = {'list': attributes} if isinstance(attributes, list) else attributes
+    except ValueError:
+        sensor._attributes = {}
+
+
+def timePolls(sensor, rest, replies, polls):
+    """ Poll the sensor with the replies in turn, return the time per poll in microseconds """
+    start = time.perf_counter()
+    for i in range(polls):
+        rest.data = replies[i % len(replies)]
+        sensor._process_data()
+    return (time.perf_counter() - start) / polls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the jsonrest processing of an unchanged 1 MB body")
+    parser.add_argument('--size', type=int, default=1 << 20, help="bytes in the JSON body")
+    parser.add_argument('--polls', type=int, default=200)
+    args = parser.parse_args()
+
+    body = makeBody(args.size, 1)
+    other = makeBody(args.size, 2)
+    rest = jsonrest.JSONRestData('GET', 'http://127.0.0.1/', None, None, None, True, timedelta(0))
+    sensor = jsonrest.JSONRestSensor(None, rest, 'bench', None, None)
+
+    failed = False
+    rest.data = body
+    sensor._process_data()
+    attributes = sensor._attributes
+    results = []
+    for name, replies in (('unchanged', [body]), ('same body', [copyOf(body), copyOf(body)]),
+                          ('changed', [other, body])):
+        results.append((name, timePolls(sensor, rest, replies, args.polls)))
+        if name != 'changed' and sensor._attributes is not attributes:
+            print("FAIL: the %s replies were parsed again" % name)
+            failed = True
+    if sensor._attributes['last'] != (2 if args.polls % 2 else 1):
+        print("FAIL: the changed replies were not processed")
+        failed = True
+
+    start = time.perf_counter()
+    for i in range(args.polls):
+        previousUpdate(sensor, body)
+    results.append(('previous', (time.perf_counter() - start) / args.polls * 1e6))
+
+    print("%d bytes body, %d polls" % (len(body), args.polls))
+    for name, usec in results:
+        print("%-10s %10.1f us per poll" % (name, usec))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+import argparse
+import os
+import random
+import sys
+import timeit
+
+# Microbenchmark for get_device_name in custom_components/kismet/device_tracker.py, from 10 to 100k devices:
+# the dict of last results indexed by MAC against the list the scanner used to scan for every call.
+#
+# Home Assistant calls get_device_name once per device found, so the list made a scan quadratic.
+# Both have to return the same names, unknown MACs included.
+#
+# Needs Home Assistant installed (the platform imports it), run with: python3 benchmarks/kismet_device_name.py
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from kismet_stub import macAddress, makeScanner
+import device_tracker
+
+_LOGGER = device_tracker._LOGGER
+
+
+def getDeviceNameList(scanner, results, device):
+    """ The previous implementation, scanning the list of results """
+    _LOGGER.debug("["+scanner.server+"] "+"Called get_device_name with device = "+str(device))
+    filter_named = [result.last_ssid for result in results
+                    if result.mac == device]
+
+    if filter_named:
+        _LOGGER.debug("["+scanner.server+"] "+"Returning name " + str(filter_named[0]) + " for client "+ str(device) )
+        return filter_named[0]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time get_device_name with a list scan and a dict lookup")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument('--lookups', type=int, default=200, help="get_device_name calls timed per size")
+    args = parser.parse_args()
+
+    # no query is made, the port doesn't matter
+    scanner = makeScanner(2501)
+    random.seed(1)
+    failed = False
+    for size in args.sizes:
+        results = [device_tracker.Device(macAddress(i), 'device %d' % i, None) for i in range(size)]
+        scanner.last_results = {device.mac: device for device in results}
+        # mostly known devices, and one in ten unknown
+        macs = [macAddress(random.randrange(size * 10 // 9 + 1)) for i in range(args.lookups)]
+
+        for mac in macs:
+            if scanner.get_device_name(mac) != getDeviceNameList(scanner, results, mac):
+                print("FAIL: %s has a different name with %d devices" % (mac, size))
+                failed = True
+
+        timings = []
+        for lookup in (lambda mac: getDeviceNameList(scanner, results, mac), scanner.get_device_name):
+            number = max(1, 10000 // size)
+            seconds = min(timeit.repeat(lambda: [lookup(mac) for mac in macs], number=number, repeat=3))
+            timings.append(seconds / number / len(macs) * 1e6)
+        print("%6d devices: list scan %10.2f us  dict lookup %6.2f us per call  (%.0fx)" % (
+            size, timings[0], timings[1], timings[0] / timings[1]))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+import argparse
+import cProfile
+import logging
+import os
+import pstats
+import sys
+import time
+
+# CPU time per scan of custom_components/kismet/device_tracker.py on a large kismet reply, against the reply
+# handling the scanner had before: r.json() decoded three times, the whole reply formatted into the INFO
+# message and curl command lines built with curlify whatever the log level.
+# Both use the scanner's pooled session, so only the reply handling differs.
+#
+# Reported per log level: the lowest CPU time (time.process_time) of a scan, the stub server runs in another process.
+# --profile prints the top functions of a scan with the current code at every level.
+#
+# Needs Home Assistant installed (the platform imports it), run with: python3 benchmarks/kismet_scan_cpu.py
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from kismet_stub import StubKismet, makeScanner
+import device_tracker
+import curlify
+
+_LOGGER = device_tracker._LOGGER
+Device = device_tracker.Device
+DeviceGPS = device_tracker.DeviceGPS
+dt_util = device_tracker.dt_util
+
+
+def legacyScanDevices(self):
+    """ scan_devices and _update_info before the lazy logging, returning the list of MACs """
+    last_results = []
+    payload = self.payload
+    _LOGGER.debug("["+self.server+"] "+"Making request with this payload:"+payload)
+
+    r = self.session.post(self.url+"/devices/last-time/"+"-"+str(self.scan_interval.total_seconds())+"/devices.json",
+        headers={ 'Content-Type': 'application/x-www-form-urlencoded'},
+        data=payload)
+
+    now = dt_util.now()
+
+    if r.ok:
+        if r.json():
+            _LOGGER.info("["+self.server+"] "+str(r.json()))
+            location = None
+
+            for pair in r.json():
+                _LOGGER.debug("["+self.server+"] "+"Found device "+str(pair['kismet.device.base.macaddr']))
+
+                if "dot11.probedssid.location" in pair and pair["dot11.probedssid.location"] != 0:
+                    location = pair["dot11.probedssid.location"]
+
+                elif "dot11.advertisedssid.location" in pair and pair["dot11.advertisedssid.location"] != 0:
+                    location = pair["dot11.advertisedssid.location"]
+
+                if location and "kismet.common.location.loc_valid" in location and location["kismet.common.location.loc_valid"] == 1:
+                    lat = 0.0
+                    lon = 0.0
+                    if "kismet.common.location.avg_loc" in location:
+                        lat = location["kismet.common.location.avg_loc"]["kismet.common.location.lat"]
+                        lon = location["kismet.common.location.avg_loc"]["kismet.common.location.lon"]
+
+                    last_results.append(DeviceGPS(pair["kismet.device.base.macaddr"].upper(), pair["kismet.device.base.name"], (lat,lon), now))
+                else:
+                    _LOGGER.debug("["+self.server+"] "+"Couldn't find GPS Coordinates in result..")
+                    _LOGGER.debug("["+self.server+"] "+"Try to reproduce with: "+curlify.to_curl(r.request))
+                    last_results.append(Device(pair["kismet.device.base.macaddr"].upper(), pair["kismet.device.base.name"], now))
+
+    _LOGGER.debug("["+self.server+"] "+"Kismet last results %s", last_results)
+    return [device.mac for device in last_results]
+
+
+def cpuPerScan(scan, scans):
+    """ The CPU time of the fastest of scans scans, the others were disturbed by something else """
+    times = []
+    for i in range(scans):
+        start = time.process_time()
+        scan()
+        times.append(time.process_time() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU time per kismet scan, lazy logging vs the previous eager one")
+    parser.add_argument('--devices', type=int, default=5000, help="devices in the kismet reply")
+    parser.add_argument('--scans', type=int, default=10)
+    parser.add_argument('--levels', nargs='+', default=['WARNING', 'INFO', 'DEBUG'])
+    parser.add_argument('--profile', action='store_true', help="profile a scan of the current code")
+    args = parser.parse_args()
+
+    # the records are formatted and written like Home Assistant does, to nowhere
+    devnull = open(os.devnull, 'w')
+    logging.basicConfig(stream=devnull, format='%(asctime)s %(levelname)s (%(threadName)s) [%(name)s] %(message)s')
+
+    failed = False
+    with StubKismet(args.devices) as stub:
+        scanner = makeScanner(stub.port)
+        for level in args.levels:
+            _LOGGER.setLevel(level)
+            current = cpuPerScan(scanner.scan_devices, args.scans)
+            if len(scanner.last_results) != args.devices:
+                print("FAIL: the scan found %d devices out of %d" % (len(scanner.last_results), args.devices))
+                failed = True
+            legacy = cpuPerScan(lambda: legacyScanDevices(scanner), args.scans)
+            print("%-8s current %8.1f ms CPU per scan  previous %8.1f ms  (%.1fx)" % (
+                level, current * 1000, legacy * 1000, legacy / current))
+
+            if args.profile:
+                profiler = cProfile.Profile()
+                profiler.runcall(scanner.scan_devices)
+                pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+    devnull.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
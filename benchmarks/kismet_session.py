@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+import argparse
+import os
+import sys
+import time
+
+# Per-scan latency of custom_components/kismet/device_tracker.py against a local stub kismet server:
+# the scanner's pooled keep-alive session against a new connection per request, like the requests.post()
+# the scanner used before (reproduced by recreating the session before every scan).
+#
+# Reported: median and 95th percentile latency of a scan and the TCP connections the stub accepted.
+# --connect-delay makes the stub slower to accept a connection, like a kismet server a few hops away.
+#
+# Needs Home Assistant installed (the platform imports it), run with: python3 benchmarks/kismet_session.py
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from kismet_stub import StubKismet, makeScanner
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def runScans(stub, scans, reconnect):
+    """ Scan the stub scans times, return the latencies and the connections it accepted """
+    scanner = makeScanner(stub.port)
+    connections = stub.connections.value
+    latencies = []
+    for i in range(scans):
+        start = time.perf_counter()
+        if reconnect:
+            scanner._connect()
+        found = scanner.scan_devices()
+        latencies.append(time.perf_counter() - start)
+        if len(found) != stub.devices:
+            raise RuntimeError("scan %d found %d devices out of %d" % (i, len(found), stub.devices))
+    scanner.session.close()
+    return latencies, stub.connections.value - connections
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-scan latency with a pooled session vs a connection per request")
+    parser.add_argument('--scans', type=int, default=500)
+    parser.add_argument('--devices', type=int, default=20, help="devices in every kismet reply")
+    parser.add_argument('--connect-delay', type=float, default=0.0, help="seconds the stub takes to accept a connection")
+    args = parser.parse_args()
+
+    failed = False
+    with StubKismet(args.devices, connectDelay=args.connect_delay) as stub:
+        for name, reconnect in (('pooled session', False), ('connection per scan', True)):
+            latencies, connections = runScans(stub, args.scans, reconnect)
+            print("%-20s median %7.3f ms  p95 %7.3f ms  connections %d for %d scans" % (
+                name, percentile(latencies, 0.5) * 1000, percentile(latencies, 0.95) * 1000, connections, args.scans))
+            if not reconnect and connections != 1:
+                print("FAIL: the pooled session opened %d connections" % connections)
+                failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
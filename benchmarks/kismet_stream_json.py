@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+# Memory and latency of one kismet scan with a large reply (50k devices by default), decoded with r.json()
+# and with stream_json (ijson, one device at a time as it comes off the socket).
+#
+# Reported: median scan time over --scans scans, then the peak of the memory allocated by Python during one
+# scan (tracemalloc, on a separate scan since tracing slows everything down). Both have to find the same devices.
+#
+# Needs Home Assistant and ijson installed, run with: python3 benchmarks/kismet_stream_json.py
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from kismet_stub import StubKismet, makeScanner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan a large kismet reply with r.json() and with stream_json")
+    parser.add_argument('--devices', type=int, default=50000, help="devices in the kismet reply")
+    parser.add_argument('--scans', type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    results = {}
+    with StubKismet(args.devices) as stub:
+        for name, streamJson in (('r.json()', False), ('stream_json', True)):
+            scanner = makeScanner(stub.port, stream_json=streamJson)
+            if scanner.stream_json != streamJson:
+                print("FAIL: stream_json needs the ijson package")
+                sys.exit(1)
+
+            latencies = []
+            for i in range(args.scans):
+                start = time.perf_counter()
+                scanner.scan_devices()
+                latencies.append(time.perf_counter() - start)
+
+            tracemalloc.start()
+            scanner.scan_devices()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            results[name] = {mac: (device.last_ssid, getattr(device, 'gps', None))
+                             for mac, device in scanner.last_results.items()}
+            print("%-12s median %8.1f ms per scan  peak memory %7.1f MiB  devices %d" % (
+                name, sorted(latencies)[len(latencies) // 2] * 1000, peak / 2.0 ** 20, len(scanner.last_results)))
+            if len(scanner.last_results) != args.devices:
+                print("FAIL: %s found %d devices out of %d" % (name, len(scanner.last_results), args.devices))
+                failed = True
+
+    if results['r.json()'] != results['stream_json']:
+        print("FAIL: r.json() and stream_json found different devices")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+import json
+import multiprocessing
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for a kismet server, shared by the kismet benchmarks.
+#
+# It answers every /devices/last-time/.../devices.json query with the same synthetic devices and runs in a
+# child process, so its CPU time doesn't show up in the measurements of the scanner.
+# The kismet device_tracker needs Home Assistant installed to be imported.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'custom_components', 'kismet'))
+import device_tracker
+
+
+def macAddress(i):
+    return ':'.join('%02X' % b for b in (0x02 << 40 | i).to_bytes(6, 'big'))
+
+
+def makeDevices(count, gps=True):
+    """ Return count devices like kismet returns them for the device_tracker fields, half of them with a GPS fix """
+    now = int(time.time())
+    devices = []
+    for i in range(count):
+        device = {
+            'kismet.device.base.macaddr': macAddress(i),
+            'kismet.device.base.name': 'device %d' % i,
+            'kismet.device.base.last_time': now - i % 30,
+        }
+        if gps and i % 2 == 0:
+            device['dot11.probedssid.location'] = {
+                'kismet.common.location.loc_valid': 1,
+                'kismet.common.location.avg_loc': {
+                    'kismet.common.location.lat': 45.0 + i * 1e-6,
+                    'kismet.common.location.lon': 7.0 + i * 1e-6,
+                },
+            }
+        else:
+            device['dot11.probedssid.location'] = 0
+        devices.append(device)
+    return devices
+
+
+class StubKismet(object):
+    """ The stub server in a child process, counting the TCP connections and requests it gets """
+
+    def __init__(self, devices=100, gps=True, connectDelay=0.0):
+        self.devices = devices
+        self.gps = gps
+        # extra time to accept a new connection, like the round trips of a TCP handshake to a remote kismet
+        self.connectDelay = connectDelay
+        self.connections = multiprocessing.Value('i', 0)
+        self.requests = multiprocessing.Value('i', 0)
+        self.process = None
+        self.port = None
+
+    def start(self):
+        ports = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=serve, args=(
+            self.devices, self.gps, self.connectDelay, self.connections, self.requests, ports))
+        self.process.daemon = True
+        self.process.start()
+        self.port = ports.get(timeout=60)
+        return self
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def serve(devices, gps, connectDelay, connections, requestCount, ports):
+    """ Run the stub server, putting its port in the ports queue """
+    body = json.dumps(makeDevices(devices, gps)).encode('utf-8')
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # the headers and the body go out in separate writes, don't let Nagle hold back the body
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            with connections.get_lock():
+                connections.value += 1
+            if connectDelay:
+                time.sleep(connectDelay)
+            BaseHTTPRequestHandler.setup(self)
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            with requestCount.get_lock():
+                requestCount.value += 1
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+def makeScanner(port, **config):
+    """ Return a KismetDeviceScanner tracking every client of the stub """
+    config = device_tracker.PLATFORM_SCHEMA(dict({
+        'platform': 'kismet',
+        'host': '127.0.0.1',
+        'port': port,
+        'clients': ['.*'],
+    }, **config))
+    return device_tracker.KismetDeviceScanner(None, config)
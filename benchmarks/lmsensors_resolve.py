@@ -0,0 +1,132 @@
+#!/usr/bin/python3
+import argparse
+import os
+import random
+import sys
+import time
+import types
+
+# Benchmark for resolveSensors/readSensors in external-scripts/temperature-lmsensors-mqtt-agent.py against a
+# mocked pysensors module with many chips, compared with the readSensor it replaced, which walked all the
+# detected chips and their features for every configured sensor on every round.
+#
+# The mock builds new chip and feature objects on every walk like pysensors does, and counts the features
+# it hands out. Both ways have to read the same values.
+#
+# Needs paho-mqtt and python-yaml installed (the agent imports them), the sensors module is always the mock.
+# Run with: python3 benchmarks/lmsensors_resolve.py [--chips 200]
+
+AGENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'external-scripts',
+                     'temperature-lmsensors-mqtt-agent.py')
+
+
+class Feature(object):
+
+    def __init__(self, chip, index):
+        self.label = 'temp%d' % (index + 1)
+        self.value = chip.index + index / 10.0 + 0.04
+
+    def get_value(self):
+        return self.value
+
+
+class Chip(object):
+
+    def __init__(self, index, features, stats):
+        self.index = index
+        self.features = features
+        self.stats = stats
+
+    def __str__(self):
+        return 'chip%d-isa-%04x' % (self.index, self.index)
+
+    def __iter__(self):
+        for i in range(self.features):
+            self.stats['features'] += 1
+            yield Feature(self, i)
+
+
+def mockSensors(chips, features):
+    """ A stand-in for the pysensors module with chips chips of features temperature features each """
+    module = types.ModuleType('sensors')
+    module.stats = {'features': 0}
+    module.init = module.cleanup = lambda: None
+    module.iter_detected_chips = lambda: (Chip(i, features, module.stats) for i in range(chips))
+    return module
+
+
+def loadAgent(conf):
+    """ Run the agent up to its MQTT connection, return its globals """
+    with open(AGENT) as f:
+        source = f.read()
+    source = source[:source.index('""" Initialize the MQTT object')]
+    agent = {'__name__': 'temperature_lmsensors_mqtt_agent'}
+    exec(compile(source, AGENT, 'exec'), agent)
+    agent['conf'] = conf
+    return agent
+
+
+def readSensor(sensors, chipName, sensorName):
+    """ The previous implementation, walking the chips for every reading """
+    try:
+        for chip in sensors.iter_detected_chips():
+            if str(chip) == chipName:
+                for feature in chip:
+                    if feature.label == sensorName:
+                        return round(feature.get_value(), 1)
+    except Exception:
+        print("Problem reading sensors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time resolving lm-sensors features once vs walking them per reading")
+    parser.add_argument('--chips', type=int, default=200)
+    parser.add_argument('--features', type=int, default=8, help="temperature features per chip")
+    parser.add_argument('--sensors', type=int, default=20, help="configured sensors")
+    parser.add_argument('--rounds', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    sensors = mockSensors(args.chips, args.features)
+    sys.modules['sensors'] = sensors
+    random.seed(args.seed)
+    conf = {'sensors': [{'chip': 'chip%d-isa-%04x' % (chip, chip), 'sensor': 'temp%d' % (feature + 1)}
+                        for chip, feature in ((random.randrange(args.chips), random.randrange(args.features))
+                                              for i in range(args.sensors))]}
+    agent = loadAgent(conf)
+
+    failed = False
+    results = []
+
+    sensors.stats['features'] = 0
+    start = time.perf_counter()
+    agent['resolveSensors']()
+    resolveTime = time.perf_counter() - start
+    resolveFeatures = sensors.stats['features']
+
+    sensors.stats['features'] = 0
+    start = time.perf_counter()
+    for i in range(args.rounds):
+        values = agent['readSensors']()
+    results.append(('resolved once', (time.perf_counter() - start) / args.rounds, sensors.stats['features'] / args.rounds))
+
+    sensors.stats['features'] = 0
+    start = time.perf_counter()
+    for i in range(args.rounds):
+        previous = dict((sensor['chip']+"/"+sensor['sensor'], readSensor(sensors, sensor['chip'], sensor['sensor']))
+                        for sensor in conf['sensors'])
+    results.append(('walk per reading', (time.perf_counter() - start) / args.rounds, sensors.stats['features'] / args.rounds))
+
+    if values != previous:
+        print("FAIL: the resolved features read %r, walking the chips reads %r" % (values, previous))
+        failed = True
+
+    print("%d chips with %d features, %d sensors configured" % (args.chips, args.features, args.sensors))
+    print("%-17s %9.1f us once, %d features walked" % ('resolveSensors', resolveTime * 1e6, resolveFeatures))
+    for name, seconds, walked in results:
+        print("%-17s %9.1f us per round, %d features walked" % (name, seconds * 1e6, walked))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
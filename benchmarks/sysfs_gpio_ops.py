@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+# Microbenchmark for external-scripts/sysfs_gpio.py: latency of one GPIO read or write, opening the value
+# file on every call like the sysfs agents used to, against pread()/pwrite() on the descriptor Gpio keeps open.
+#
+# The GPIOs live in a fake sysfs tree of regular files in a temporary directory, so this measures the
+# syscall overhead on the Python side, not the GPIO driver. Both ways have to read back what was written.
+#
+# Run with: python3 benchmarks/sysfs_gpio_ops.py [--iterations 100000]
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'external-scripts'))
+import sysfs_gpio
+
+
+def makeTree(root, gpio):
+    """ A fake /sys/class/gpio with one exported pin """
+    path = os.path.join(root, 'gpio%d' % gpio)
+    os.mkdir(path)
+    for name, contents in (('direction', 'in\n'), ('value', '0\n'), ('edge', 'none\n')):
+        with open(os.path.join(path, name), 'w') as f:
+            f.write(contents)
+    return os.path.join(path, 'value')
+
+
+""" The previous implementation: build the path and open the value file on every call """
+
+
+def readOpen(path):
+    with open(path) as f:
+        return bool(int(f.read()))
+
+
+def writeOpen(path, value):
+    with open(path, 'w') as f:
+        f.write('1\n' if int(value) else '0\n')
+
+
+def measure(operation, iterations):
+    seconds = min(timeit.repeat(operation, number=iterations, repeat=3))
+    return seconds / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time sysfs GPIO reads and writes, open per call vs pread/pwrite")
+    parser.add_argument('--iterations', type=int, default=100000)
+    parser.add_argument('--gpio', type=int, default=17)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='sysfs_gpio_ops.')
+    try:
+        valueFile = makeTree(root, args.gpio)
+        gpio = sysfs_gpio.Gpio(args.gpio, 'out', root)
+
+        failed = False
+        for value in (True, False, True):
+            writeOpen(valueFile, value)
+            if gpio.read() != value:
+                print("FAIL: Gpio.read() returned %r after writing %r" % (gpio.read(), value))
+                failed = True
+            gpio.write(not value)
+            if readOpen(valueFile) != (not value):
+                print("FAIL: read %r after Gpio.write(%r)" % (readOpen(valueFile), not value))
+                failed = True
+
+        results = [
+            ('read, open per call', measure(lambda: readOpen(valueFile), args.iterations)),
+            ('read, pread', measure(gpio.read, args.iterations)),
+            ('write, open per call', measure(lambda: writeOpen(valueFile, 1), args.iterations)),
+            ('write, pwrite', measure(lambda: gpio.write(1), args.iterations)),
+        ]
+        gpio.close()
+    finally:
+        shutil.rmtree(root)
+
+    for name, usec in results:
+        print("%-22s %7.2f us per operation" % (name, usec))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/python
+import os
+import re
+import sys
+import timeit
+
+# Microbenchmark for external-scripts/w1_therm.py: parse a corpus of w1_slave outputs (DS18B20)
+# with the single pass parser and with the regex loop the temperature scripts used before.
+# Both have to agree on every sample, the bad CRCs included.
+#
+# Run with: python benchmarks/w1_therm_parse.py [iterations]
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'external-scripts'))
+import w1_therm
+
+# w1_slave outputs in the kernel format: good readings, bad CRCs and the 85C power-on value
+CORPUS = [
+    "72 01 4b 46 7f ff 0e 10 57 : crc=57 YES\n72 01 4b 46 7f ff 0e 10 57 t=23125\n",
+    "6e 01 4b 46 7f ff 02 10 71 : crc=71 YES\n6e 01 4b 46 7f ff 02 10 71 t=22875\n",
+    "91 01 4b 46 7f ff 0f 10 25 : crc=25 YES\n91 01 4b 46 7f ff 0f 10 25 t=25062\n",
+    "50 05 4b 46 7f ff 0c 10 1c : crc=1c YES\n50 05 4b 46 7f ff 0c 10 1c t=85000\n",
+    "ff ff ff ff ff ff ff ff ff : crc=c9 NO\nff ff ff ff ff ff ff ff ff t=-62\n",
+    "00 00 00 00 00 00 00 00 00 : crc=00 YES\n00 00 00 00 00 00 00 00 00 t=0\n",
+    "a2 00 4b 46 7f ff 0e 10 d8 : crc=d8 YES\na2 00 4b 46 7f ff 0e 10 d8 t=10125\n",
+    "72 01 4b 46 7f ff 0e 10 57 : crc=3a NO\n72 01 4b 46 7f ff 0e 10 57 t=23125\n",
+    "5e 01 4b 46 7f ff 02 10 2f : crc=2f YES\n5e 01 4b 46 7f ff 02 10 2f t=21875\n",
+    "d0 01 4b 46 7f ff 10 10 c1 : crc=c1 YES\nd0 01 4b 46 7f ff 10 10 c1 t=29000\n",
+]
+
+
+""" The parsing done by readTemperature before w1_therm, returning millidegrees like w1_therm.parse """
+
+
+def parseRegex(data):
+    valid = False
+    for line in data.splitlines(True):
+        if re.search('crc=.*YES', line):
+            valid = True
+            continue
+        if valid and re.search('t=[0-9]+', line):
+            temperature = re.search('t=([0-9]+)', line)
+            output = "%.1f" % (float(temperature.group(1)) / 1000.0)
+            return int(round(float(output) * 1000))
+    return None
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    for data in CORPUS:
+        expected = parseRegex(data)
+        parsed = w1_therm.parse(data)
+        if parsed is not None:
+            # the old code only kept 1 digit of accuracy
+            parsed = w1_therm.tenths(parsed) * 100
+        if parsed != expected:
+            print("FAIL: %r parsed as %r, the regex parser says %r" % (data, parsed, expected))
+            sys.exit(1)
+
+    for name, parse in (('regex', parseRegex), ('w1_therm.parse', w1_therm.parse)):
+        seconds = min(timeit.repeat(lambda: [parse(data) for data in CORPUS], number=iterations, repeat=3))
+        print("%-15s %7.2f us per w1_slave" % (name, seconds / iterations / len(CORPUS) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,19 +4,35 @@ Support for tracking wifi-enabled devices through Kismet.
 For more details about this platform, please refer to the documentation at
 https://home-assistant.io/components/device_tracker.kismet/
 """
+import asyncio
 from datetime import timedelta
+import email.utils
 import logging
 import re
+import time
 import urllib
 import requests
 import json
 import curlify
+import aiohttp
 from collections import namedtuple
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3Error
+from urllib3.util.retry import Retry
+
+try:
+    # optional, only needed for stream_json
+    import ijson
+    JSON_ERRORS = (ValueError, ijson.JSONError)
+except ImportError:
+    ijson = None
+    JSON_ERRORS = (ValueError,)
 
 import voluptuous as vol
 
 import homeassistant.helpers.config_validation as cv
 import homeassistant.util.dt as dt_util
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.components.device_tracker import (
     CONF_SCAN_INTERVAL, DOMAIN, PLATFORM_SCHEMA, DeviceScanner)
 from homeassistant.const import ( CONF_HOSTS, CONF_LATITUDE, CONF_LONGITUDE, ATTR_GPS_ACCURACY, ATTR_LATITUDE, ATTR_LONGITUDE)
@@ -33,6 +49,21 @@ CONF_SSIDS = 'ssids'
 CONF_CLIENTS = 'clients'
 CONF_LOCAL_LATITUDE = 'latitude'
 CONF_LOCAL_LONGITUDE = 'longitude'
+CONF_CONNECT_TIMEOUT = 'connect_timeout'
+CONF_READ_TIMEOUT = 'read_timeout'
+CONF_RETRIES = 'retries'
+CONF_BACKOFF_FACTOR = 'backoff_factor'
+CONF_STREAM_JSON = 'stream_json'
+CONF_COMBINE_REGEX = 'combine_regex'
+CONF_INCREMENTAL = 'incremental'
+CONF_DEVICE_TTL = 'device_ttl'
+CONF_ADAPTIVE = 'adaptive'
+CONF_MAX_SCAN_INTERVAL = 'max_scan_interval'
+CONF_FAST_POLL_DURATION = 'fast_poll_duration'
+
+DEFAULT_SCAN_INTERVAL = timedelta(seconds=35)
+
+LAST_TIME_FIELD = 'kismet.device.base.last_time'
 
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({
     vol.Required(CONF_KISMET_SERVER, default='127.0.0.1'): cv.string,
@@ -43,9 +74,19 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({
     vol.Optional(CONF_CLIENTS, default=[]): cv.ensure_list,
     vol.Optional(CONF_LOCAL_LATITUDE, default=0.0): cv.latitude,
     vol.Optional(CONF_LOCAL_LONGITUDE, default=0.0): cv.longitude,
-    #vol.Required(CONF_SCAN_INTERVAL): cv.time_period_seconds
-    #vol.Required(CONF_SCAN_INTERVAL): cv.positive_int
-    #vol.Required(CONF_SCAN_INTERVAL): cv.timedelta
+    vol.Optional(CONF_CONNECT_TIMEOUT, default=3.05): vol.Coerce(float),
+    vol.Optional(CONF_READ_TIMEOUT, default=10): vol.Coerce(float),
+    vol.Optional(CONF_RETRIES, default=3): cv.positive_int,
+    vol.Optional(CONF_BACKOFF_FACTOR, default=0.5): vol.Coerce(float),
+    vol.Optional(CONF_STREAM_JSON, default=False): cv.boolean,
+    vol.Optional(CONF_COMBINE_REGEX, default=False): cv.boolean,
+    vol.Optional(CONF_INCREMENTAL, default=False): cv.boolean,
+    vol.Optional(CONF_DEVICE_TTL): cv.time_period,
+    vol.Optional(CONF_HOSTS): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional(CONF_SCAN_INTERVAL): cv.time_period,
+    vol.Optional(CONF_ADAPTIVE, default=False): cv.boolean,
+    vol.Optional(CONF_MAX_SCAN_INTERVAL, default=timedelta(minutes=5)): cv.time_period,
+    vol.Optional(CONF_FAST_POLL_DURATION, default=timedelta(minutes=2)): cv.time_period,
 })
 
 
@@ -55,6 +96,14 @@ def get_scanner(hass, config):
     return KismetDeviceScanner(hass, config[DOMAIN])
 
 
+async def async_get_scanner(hass, config):
+    """Return an async scanner polling several kismet hosts, or the regular scanner."""
+    if config[DOMAIN].get(CONF_HOSTS):
+        _LOGGER.debug("Called async_get_scanner")
+        return AsyncKismetDeviceScanner(hass, config[DOMAIN])
+    return await hass.async_add_executor_job(get_scanner, hass, config)
+
+
 DeviceGPS = namedtuple('Device', ['mac', 'last_ssid', 'gps', 'last_update'])
 Device = namedtuple('Device', ['mac', 'last_ssid', 'last_update'])
 
@@ -62,20 +111,53 @@ class KismetDeviceScanner(DeviceScanner):
     """This class scans for devices using kismet."""
 
     exclude = []
+    # kismet servers queried together, see AsyncKismetDeviceScanner
+    hosts = []
 
     def __init__(self, hass, config):
         """Initialize the scanner."""
-        self.last_results = []
+        # scan results, indexed by the (upper case) MAC address
+        self.last_results = {}
 
         self.server = config[CONF_KISMET_SERVER]
         self.port = config[CONF_KISMET_PORT]
         self.user = config[CONF_KISMET_USER]
         self.password = config[CONF_KISMET_PASS]
-        #self.scan_interval = config[CONF_SCAN_INTERVAL]
-        self.scan_interval = timedelta(seconds=35)
-        #self.scan_interval = 35
+        # without scan_interval, Home Assistant keeps its own scan cadence and
+        # DEFAULT_SCAN_INTERVAL is only the kismet last-time window
+        self.scan_interval = config.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
+        # adaptive polling: Home Assistant calls us every scan_interval, but we only
+        # query kismet every poll_interval, which backs off while nothing changes
+        self.adaptive = config.get(CONF_ADAPTIVE, False)
+        # never back off to less than the base interval
+        self.max_scan_interval = max(config.get(CONF_MAX_SCAN_INTERVAL, self.scan_interval), self.scan_interval)
+        self.fast_poll_duration = config.get(CONF_FAST_POLL_DURATION, timedelta(0))
+        self.poll_interval = self.scan_interval
+        self.next_poll = 0
+        self.fast_poll_until = 0
         self.ssids = config[CONF_SSIDS]
         self.clients = config[CONF_CLIENTS]
+        self.timeout = (config[CONF_CONNECT_TIMEOUT], config[CONF_READ_TIMEOUT])
+        self.retries = config[CONF_RETRIES]
+        self.backoff_factor = config[CONF_BACKOFF_FACTOR]
+        self.stream_json = config[CONF_STREAM_JSON]
+        if self.stream_json and ijson is None:
+            _LOGGER.error("["+self.server+"] "+"stream_json requires the ijson package. Falling back to regular JSON parsing")
+            self.stream_json = False
+        self.combine_regex = config[CONF_COMBINE_REGEX]
+        self.url = "http://"+self.server+":"+str(self.port)
+        self.incremental = config[CONF_INCREMENTAL]
+        self.device_ttl = config.get(CONF_DEVICE_TTL, self.scan_interval)
+        # server timestamp of the newest device seen, used as the start of the next incremental poll
+        self.last_seen = None
+        # server timestamp of the last sighting of every device in last_results, for the incremental expiry
+        self.last_times = {}
+        # the query only depends on the configuration, so build it once
+        self.payload = self._build_payload()
+        self.session = None
+        # the last request logged by _log_curl
+        self.curl_request = None
+        self._connect()
 
 #        self.longitude = config[CONF_LOCAL_LONGITUDE]
 #        if self.longitude == 0:
@@ -111,114 +193,368 @@ class KismetDeviceScanner(DeviceScanner):
 #           return self.longitude
 #        return None
     
+    def _build_payload(self):
+        """Prepare the kismet query (fields to return and regex filters)."""
+        # two different records for client/ssid
+        ssid_gps_prefix = "dot11.device/dot11.device.last_beaconed_ssid_record/dot11.advertisedssid.location"
+        client_gps_prefix = "dot11.device/dot11.device.last_probed_ssid_record/dot11.probedssid.location"
+
+        parameters = {"regex": [], "fields": ["kismet.device.base.name", "kismet.device.base.macaddr"] }
+
+        if self.incremental or self.hosts:
+            # server side time of the last sighting, to poll incrementally or pick the newest sighting across hosts
+            parameters["fields"].append(LAST_TIME_FIELD)
+
+        if len(self.ssids):
+            parameters["fields"].append(ssid_gps_prefix)
+
+        if len(self.clients):
+            parameters["fields"].append(client_gps_prefix)
+
+        ssids = [str(ssid) for ssid in self.ssids]
+        clients = [str(client).upper() for client in self.clients]
+
+        if self.combine_regex:
+            # one alternation per field, so kismet runs a single match per device and field
+            # instead of one match per configured entry
+            if ssids:
+                _LOGGER.debug("["+self.server+"] "+"Adding "+str(len(ssids))+" SSIDs as one regex...")
+                parameters["regex"].append(["kismet.device.base.name", "|".join("(?:"+ssid+")" for ssid in ssids)])
+            if clients:
+                _LOGGER.debug("["+self.server+"] "+"Adding "+str(len(clients))+" clients as one regex...")
+                parameters["regex"].append(["kismet.device.base.macaddr", "|".join("(?:"+client+")" for client in clients)])
+        else:
+            for ssid in ssids:
+                _LOGGER.debug("["+self.server+"] "+"Adding SSID " + ssid + "...")
+                parameters["regex"].append(["kismet.device.base.name", ssid])
+
+            for client in clients:
+                _LOGGER.debug("["+self.server+"] "+"Adding client " + client + "...")
+                parameters["regex"].append(["kismet.device.base.macaddr", client])
+
+        #return "json="+urllib.parse.quote_plus(json.dumps(parameters))
+        return "json="+json.dumps(parameters)
+
+    def _connect(self):
+        """(Re)create the keep-alive HTTP session used for all kismet queries."""
+        if self.session is not None:
+            self.session.close()
+
+        # retry idempotent failures (connect errors, 5xx) with exponential backoff.
+        # POST is safe to retry here because the kismet query does not change server state
+        retry = Retry(total=self.retries, connect=self.retries, read=self.retries,
+                      backoff_factor=self.backoff_factor,
+                      status_forcelist=[500, 502, 503, 504],
+                      allowed_methods=frozenset(['GET', 'POST']),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.auth = (self.user, self.password)
+        self.session.headers.update({'Content-Type': 'application/x-www-form-urlencoded',
+                                     'Connection': 'keep-alive'})
+
+    def _poll_due(self):
+        """Return True if kismet should be queried on this scan."""
+        return not self.adaptive or time.monotonic() >= self.next_poll
+
+    def _adapt_interval(self, previous):
+        """Poll fast for a while after devices come or go, back off exponentially otherwise."""
+        if not self.adaptive:
+            return
+
+        now = time.monotonic()
+        if set(self.last_results) != previous:
+            _LOGGER.debug("[%s] Tracked devices changed, polling every %s", self.server, self.scan_interval)
+            self.poll_interval = self.scan_interval
+            self.fast_poll_until = now + self.fast_poll_duration.total_seconds()
+        elif now >= self.fast_poll_until:
+            self.poll_interval = min(self.poll_interval * 2, self.max_scan_interval)
+            _LOGGER.debug("[%s] Nothing changed, backing off to %s", self.server, self.poll_interval)
+
+        self.next_poll = now + self.poll_interval.total_seconds()
+
     def scan_devices(self):
         """Scan for new devices and return a list with found MACs."""
-        self._update_info()
+        if self._poll_due():
+            previous = set(self.last_results)
+            self._update_info()
+            self._adapt_interval(previous)
 
-        _LOGGER.debug("["+self.server+"] "+"Kismet last results %s", self.last_results)
+        _LOGGER.debug("[%s] Kismet last results %s", self.server, self.last_results)
 
-        return [device.mac for device in self.last_results]
+        return list(self.last_results)
 
     def get_device_name(self, device):
         """Return the name of the given device or None if we don't know."""
-        _LOGGER.debug("["+self.server+"] "+"Called get_device_name with device = "+str(device))
-        filter_named = [result.last_ssid for result in self.last_results
-                        if result.mac == device]
+        _LOGGER.debug("[%s] Called get_device_name with device = %s", self.server, device)
+        result = self.last_results.get(str(device).upper())
 
-        if filter_named:
-            _LOGGER.debug("["+self.server+"] "+"Returning name " + str(filter_named[0]) + " for client "+ str(device) )
-            return filter_named[0]
+        if result:
+            _LOGGER.debug("[%s] Returning name %s for client %s", self.server, result.last_ssid, device)
+            return result.last_ssid
         return None
 
-    def _update_info(self):
-        """Scan the network for devices.
+    @staticmethod
+    def _location(pair):
+        """Return the location record of one entry of the kismet reply, or None."""
+        if "dot11.probedssid.location" in pair and pair["dot11.probedssid.location"] != 0:
+            return pair["dot11.probedssid.location"]
 
-        Returns boolean if scanning successful.
+        elif "dot11.advertisedssid.location" in pair and pair["dot11.advertisedssid.location"] != 0:
+            return pair["dot11.advertisedssid.location"]
+
+        return None
+
+    def _parse_device(self, pair, now, request):
+        """Build a Device/DeviceGPS record out of one entry of the kismet reply."""
+        _LOGGER.debug("[%s] Found device %s", self.server, pair['kismet.device.base.macaddr'])
+        location = self._location(pair)
+
+        if location and "kismet.common.location.loc_valid" in location and location["kismet.common.location.loc_valid"] == 1:
+            # instead of delving further into the structure, we use the integer coordinates
+            #lat = location["kismet.common.location.avg_lat"] * .000001
+            #lon = location["kismet.common.location.avg_lon"] * .000001
+            lat = 0.0
+            lon = 0.0
+            if "kismet.common.location.avg_loc" in location:
+                lat = location["kismet.common.location.avg_loc"]["kismet.common.location.lat"]
+                lon = location["kismet.common.location.avg_loc"]["kismet.common.location.lon"]
+
+            return DeviceGPS(pair["kismet.device.base.macaddr"].upper(), pair["kismet.device.base.name"], (lat,lon), now)
+
+        _LOGGER.debug("[%s] Couldn't find GPS Coordinates in result..", self.server)
+        self._log_curl(request)
+        return Device(pair["kismet.device.base.macaddr"].upper(), pair["kismet.device.base.name"], now)
+
+    def _log_curl(self, request):
+        """Log a curl command line reproducing the request, once per request and only if debug logging is on."""
+        # every device without GPS asks for it, one line per query is enough
+        if request is not None and request is not self.curl_request and _LOGGER.isEnabledFor(logging.DEBUG):
+            self.curl_request = request
+            _LOGGER.debug("[%s] Try to reproduce with: %s", self.server, curlify.to_curl(request))
+
+    @staticmethod
+    def _server_time(response, newest):
+        """Return the kismet clock when it answered, from the Date header, or the newest sighting."""
+        date = response.headers.get('Date')
+        if date:
+            try:
+                return email.utils.parsedate_to_datetime(date).timestamp()
+            except (TypeError, ValueError):
+                pass
+        return newest
+
+    def _merge_results(self, changed, changed_times, server_time):
+        """Merge the devices changed since the last poll into the local device table.
+
+        Devices which kismet did not see for longer than the TTL, on the kismet
+        clock, are dropped, so the table holds the same devices a full query
+        would have returned.
         """
-        _LOGGER.debug("["+self.server+"] "+"Preparing kismet query...")
-        last_results = []
-        #prepare the query
+        results = dict(self.last_results)
+        results.update(changed)
+        last_times = dict(self.last_times)
+        last_times.update(changed_times)
 
-        # two different records for client/ssid
-        ssid_gps_prefix = "dot11.device/dot11.device.last_beaconed_ssid_record/dot11.advertisedssid.location"
-        client_gps_prefix = "dot11.device/dot11.device.last_probed_ssid_record/dot11.probedssid.location"
-        
-        parameters = {"regex": [], "fields": ["kismet.device.base.name", "kismet.device.base.macaddr"] }
+        cutoff = server_time - self.device_ttl.total_seconds()
+        for mac in [mac for mac in results if last_times.get(mac, 0) < cutoff]:
+            _LOGGER.debug("[%s] Expiring device %s", self.server, mac)
+            del results[mac]
+            del last_times[mac]
 
-        if len(self.ssids):
-            parameters["fields"].append(ssid_gps_prefix)
-        
-        if len(self.clients):
-            parameters["fields"].append(client_gps_prefix)
+        return results, last_times
 
-        for ssid in self.ssids:
-            _LOGGER.debug("["+self.server+"] "+"Adding SSID " + ssid + "...")
-            parameters["regex"].append(["kismet.device.base.name", str(ssid)])
-        
-        for client in self.clients:
-            _LOGGER.debug("["+self.server+"] "+"Adding client " + client + "...")
-            parameters["regex"].append(["kismet.device.base.macaddr", str(client).upper()])
-        
+    def _update_info(self):
+        """Scan the network for devices.
 
-        #payload = "json="+urllib.parse.quote_plus(json.dumps(parameters))
-        payload = "json="+json.dumps(parameters)
-        _LOGGER.debug("["+self.server+"] "+"Making request with this payload:"+payload)
+        Returns boolean if scanning successful.
+        """
+        _LOGGER.debug("[%s] Preparing kismet query...", self.server)
+        last_results = {}
+        last_times = {}
+        server_time = None
+        success = False
+        newest = self.last_seen or 0
+        _LOGGER.debug("[%s] Making request with this payload:%s", self.server, self.payload)
+
+        if self.incremental and self.last_seen:
+            # only ask for what changed since the newest device we already know about
+            since = str(self.last_seen)
+        else:
+            since = "-"+str(self.poll_interval.total_seconds())
 
         try:
-            r = requests.post("http://"+self.server+":"+str(self.port)+"/devices/last-time/"+"-"+str(self.scan_interval.total_seconds())+"/devices.json",
-                headers={ 'Content-Type': 'application/x-www-form-urlencoded'},
-                data=payload,
-                auth=(self.user, self.password))
-            
-            now = dt_util.now()
-            
-            if r.ok:
-                if r.json():
+            r = self.session.post(self.url+"/devices/last-time/"+since+"/devices.json",
+                data=self.payload,
+                timeout=self.timeout,
+                stream=self.stream_json)
+
+            with r:
+                now = dt_util.now()
+
+                if r.ok:
                     # we got a valid reply. Should look like this:
                     #[{'kismet.device.base.macaddr': 'AA:BB:CC:DD:EE:FF', 'kismet.device.base.name': 'My Device Name',
                     #  'dot11.[probed/advertised]ssid.location': { ... } }]
-
-                    _LOGGER.info("["+self.server+"] "+str(r.json()))
-                    location = None
-
-                    for pair in r.json():
-                        _LOGGER.debug("["+self.server+"] "+"Found device "+str(pair['kismet.device.base.macaddr']))
-
-                        if "dot11.probedssid.location" in pair and pair["dot11.probedssid.location"] != 0:
-                            location = pair["dot11.probedssid.location"]
-                        
-                        elif "dot11.advertisedssid.location" in pair and pair["dot11.advertisedssid.location"] != 0:
-                            location = pair["dot11.advertisedssid.location"]
-                         
-                        if location and "kismet.common.location.loc_valid" in location and location["kismet.common.location.loc_valid"] == 1:
-                            # instead of delving further into the structure, we use the integer coordinates
-                            #lat = location["kismet.common.location.avg_lat"] * .000001
-                            #lon = location["kismet.common.location.avg_lon"] * .000001
-                            lat = 0.0
-                            lon = 0.0
-                            if "kismet.common.location.avg_loc" in location:
-                                lat = location["kismet.common.location.avg_loc"]["kismet.common.location.lat"]
-                                lon = location["kismet.common.location.avg_loc"]["kismet.common.location.lon"]
-
-                            last_results.append(DeviceGPS(pair["kismet.device.base.macaddr"].upper(), pair["kismet.device.base.name"], (lat,lon), now))
+                    try:
+                        if self.stream_json:
+                            # decode the reply incrementally, one device at a time, as it comes off the socket
+                            r.raw.decode_content = True
+                            devices = ijson.items(r.raw, 'item', use_float=True)
                         else:
-                            _LOGGER.debug("["+self.server+"] "+"Couldn't find GPS Coordinates in result..")
-                            _LOGGER.debug("["+self.server+"] "+"Try to reproduce with: "+curlify.to_curl(r.request))
-                            last_results.append(Device(pair["kismet.device.base.macaddr"].upper(), pair["kismet.device.base.name"], now))
-                else:
-                    if r.text == "[]":
-                        _LOGGER.debug(f"[{self.server}] Nobody in range...")
+                            devices = r.json()
+                            _LOGGER.info("[%s] %s", self.server, devices)
+
+                        if not isinstance(devices, list) and not self.stream_json:
+                            raise ValueError("reply is not a list of devices")
+
+                        for pair in devices:
+                            device = self._parse_device(pair, now, r.request)
+                            last_results[device.mac] = device
+                            last_times[device.mac] = int(pair.get(LAST_TIME_FIELD, 0))
+                            newest = max(newest, last_times[device.mac])
+                    except JSON_ERRORS + (TypeError, KeyError) as err:
+                        _LOGGER.error("[%s] Got an error in the kismet reply: %s", self.server, err)
+                        self._log_curl(r.request)
+                        last_results = {}
+                    except Urllib3Error as err:
+                        # with stream_json the reply is read straight off the socket, which
+                        # can drop or time out half way through
+                        _LOGGER.error("[%s] Error reading the kismet reply: %s", self.server, err)
+                        last_results = {}
+                        # the connection is left half-read, so reconnect from scratch
+                        self._connect()
                     else:
-                        _LOGGER.error(f"[{self.server}] Got an error in the kismet reply: {r.text}")
-                        _LOGGER.debug(f"[{self.server}] Try to reproduce with: "+curlify.to_curl(r.request))
-            else:
-                _LOGGER.error(f"[{self.server}] Got an error in the kismet query. Error code {r.status_code}, reply text {r.text}")
-                _LOGGER.debug(f"[{self.server}] Try to reproduce with: "+curlify.to_curl(r.request))
+                        success = True
+                        server_time = self._server_time(r, newest)
+                        if not last_results:
+                            _LOGGER.debug("[%s] Nobody in range...", self.server)
+                else:
+                    _LOGGER.error("[%s] Got an error in the kismet query. Error code %s, reply text %s", self.server, r.status_code, r.text)
+                    self._log_curl(r.request)
 
         except requests.exceptions.ConnectionError:
             _LOGGER.error("["+self.server+"] "+"Error connecting to kismet instance")
+            # drop the pooled connection so the next scan reconnects from scratch
+            self._connect()
+        except requests.exceptions.Timeout:
+            _LOGGER.error("["+self.server+"] "+"Timed out waiting for kismet instance")
+
+        if self.incremental:
+            if success:
+                last_results, self.last_times = self._merge_results(last_results, last_times, server_time)
+                self.last_seen = newest or None
+            else:
+                # start over with a full query, like a regular scan would
+                self.last_seen = None
+                self.last_times = {}
 
         self.last_results = last_results
 
-        _LOGGER.debug("["+self.server+"] "+"Kismet scan finished")
+        _LOGGER.debug("[%s] Kismet scan finished", self.server)
         return True
+
+
+class AsyncKismetDeviceScanner(KismetDeviceScanner):
+    """This class scans for devices on several kismet servers at once."""
+
+    def __init__(self, hass, config):
+        """Initialize the scanner."""
+        self.websession = async_get_clientsession(hass)
+        self.hosts = []
+        for host in config[CONF_HOSTS]:
+            # hosts can be given as host or host:port
+            server, _, port = host.partition(':')
+            self.hosts.append((server, int(port or config[CONF_KISMET_PORT])))
+
+        super().__init__(hass, config)
+
+        if self.incremental or self.stream_json:
+            _LOGGER.warning("["+self.server+"] "+"incremental and stream_json are not supported with multiple hosts and will be ignored")
+            self.incremental = False
+            self.stream_json = False
+            self.payload = self._build_payload()
+
+    def _connect(self):
+        """Prepare the auth and per-host timeout for the shared aiohttp session."""
+        self.auth = aiohttp.BasicAuth(self.user, self.password)
+        self.client_timeout = aiohttp.ClientTimeout(total=self.timeout[0] + self.timeout[1],
+                                                    sock_connect=self.timeout[0])
+
+    async def async_scan_devices(self):
+        """Scan all kismet hosts concurrently and return a list with found MACs."""
+        if self._poll_due():
+            previous = set(self.last_results)
+            await self._async_update_info()
+            self._adapt_interval(previous)
+
+        _LOGGER.debug("[%s] Kismet last results %s", self.server, self.last_results)
+
+        return list(self.last_results)
+
+    async def async_get_device_name(self, device):
+        """Return the name of the given device or None if we don't know."""
+        return self.get_device_name(device)
+
+    async def _async_update_info(self):
+        """Query every kismet host at the same time and merge the results per MAC."""
+        replies = await asyncio.gather(*[self._async_query(server, port) for server, port in self.hosts])
+
+        # mac -> (sighting, device)
+        merged = {}
+        for reply in replies:
+            for mac, (sighting, device) in reply.items():
+                known = merged.get(mac)
+                if known is None or self._is_better(sighting, known[0]):
+                    merged[mac] = (sighting, device)
+
+        self.last_results = {mac: device for mac, (sighting, device) in merged.items()}
+
+        _LOGGER.debug("[%s] Kismet scan finished", self.server)
+        return True
+
+    def _sighting(self, pair):
+        """Return (loc_valid, last_time) for one entry of a kismet reply, used to rank the hosts."""
+        location = self._location(pair)
+        loc_valid = bool(location) and location.get("kismet.common.location.loc_valid") == 1
+        return (loc_valid, int(pair.get(LAST_TIME_FIELD, 0)))
+
+    @staticmethod
+    def _is_better(sighting, known):
+        """Prefer a valid GPS fix, then the most recent sighting by the kismet server clock."""
+        return sighting > known
+
+    async def _async_query(self, server, port):
+        """Query a single kismet host and return {mac: (sighting, device)}. A slow or failing host returns no devices."""
+        results = {}
+        url = "http://"+server+":"+str(port)+"/devices/last-time/"+"-"+str(self.poll_interval.total_seconds())+"/devices.json"
+
+        try:
+            async with self.websession.post(url,
+                    data=self.payload,
+                    headers={'Content-Type': 'application/x-www-form-urlencoded'},
+                    auth=self.auth,
+                    timeout=self.client_timeout) as r:
+                now = dt_util.now()
+
+                if r.status == 200:
+                    devices = await r.json(content_type=None)
+                    if not isinstance(devices, list):
+                        raise ValueError("reply is not a list of devices")
+
+                    for pair in devices:
+                        device = self._parse_device(pair, now, None)
+                        results[device.mac] = (self._sighting(pair), device)
+                else:
+                    _LOGGER.error("[%s] Got an error in the kismet query. Error code %s, reply text %s", server, r.status, await r.text())
+
+        except asyncio.TimeoutError:
+            _LOGGER.error("["+server+"] "+"Timed out waiting for kismet instance")
+        except aiohttp.ClientError:
+            _LOGGER.error("["+server+"] "+"Error connecting to kismet instance")
+        except (ValueError, TypeError, KeyError) as err:
+            _LOGGER.error("[%s] Got an error in the kismet reply: %s", server, err)
+
+        return results
@@ -6,13 +6,23 @@ https://home-assistant.io/components/sensor.rest/
 
 Modified to parse a JSON reply and store data as attributes
 """
+import asyncio
 import logging
+import threading
+import time
 
 import voluptuous as vol
 import json
 import requests
+import aiohttp
 from requests.auth import HTTPBasicAuth, HTTPDigestAuth
 
+try:
+    # optional, used to pick json_attributes out of big replies without building the whole document
+    import ijson
+except ImportError:
+    ijson = None
+
 from homeassistant.components.sensor import PLATFORM_SCHEMA
 from homeassistant.const import (
     CONF_PAYLOAD, CONF_NAME, CONF_VALUE_TEMPLATE, CONF_METHOD, CONF_RESOURCE,
@@ -20,6 +30,7 @@ from homeassistant.const import (
     CONF_PASSWORD, CONF_AUTHENTICATION, HTTP_BASIC_AUTHENTICATION,
     HTTP_DIGEST_AUTHENTICATION, CONF_HEADERS)
 from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 import homeassistant.helpers.config_validation as cv
 
 _LOGGER = logging.getLogger(__name__)
@@ -28,6 +39,26 @@ DEFAULT_METHOD = 'GET'
 DEFAULT_NAME = 'JSON REST Sensor'
 DEFAULT_VERIFY_SSL = True
 
+CONF_JSON_PATH = 'json_path'
+CONF_ASYNC = 'async'
+CONF_JSON_ATTRIBUTES = 'json_attributes'
+CONF_STALE_WHILE_REVALIDATE = 'stale_while_revalidate'
+
+# sensors polling the same request share one fetch done at most this often (seconds)
+MIN_TIME_BETWEEN_FETCHES = 2
+
+# after a failed request, skip the resource for this long (seconds), doubling on each failure
+FAILURE_BACKOFF = 5
+MAX_FAILURE_BACKOFF = 300
+
+# maximum number of requests in flight at once for the async sensors
+MAX_CONCURRENT_REQUESTS = 10
+
+# one JSONRestData per unique request, shared by all the sensors using it
+_FETCHERS = {}
+_FETCHERS_LOCK = threading.Lock()
+_REQUESTS_SEMAPHORE = None
+
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({
     vol.Required(CONF_RESOURCE): cv.url,
     vol.Optional(CONF_AUTHENTICATION):
@@ -41,6 +72,11 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({
     vol.Optional(CONF_USERNAME): cv.string,
     vol.Optional(CONF_VALUE_TEMPLATE): cv.template,
     vol.Optional(CONF_VERIFY_SSL, default=DEFAULT_VERIFY_SSL): cv.boolean,
+    # json_path keeps the attributes of one part of the reply, json_attributes picks several parts
+    vol.Exclusive(CONF_JSON_PATH, 'json_selection'): cv.string,
+    vol.Optional(CONF_ASYNC, default=False): cv.boolean,
+    vol.Exclusive(CONF_JSON_ATTRIBUTES, 'json_selection'): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional(CONF_STALE_WHILE_REVALIDATE, default=0): cv.time_period,
 })
 
 
@@ -56,6 +92,9 @@ def setup_platform(hass, config, add_devices, discovery_info=None):
     headers = config.get(CONF_HEADERS)
     unit = config.get(CONF_UNIT_OF_MEASUREMENT)
     value_template = config.get(CONF_VALUE_TEMPLATE)
+    json_path = config.get(CONF_JSON_PATH)
+    json_attributes = config.get(CONF_JSON_ATTRIBUTES)
+    stale_time = config.get(CONF_STALE_WHILE_REVALIDATE)
     if value_template is not None:
         value_template.hass = hass
 
@@ -66,20 +105,181 @@ def setup_platform(hass, config, add_devices, discovery_info=None):
             auth = HTTPBasicAuth(username, password)
     else:
         auth = None
-    rest = JSONRestData(method, resource, auth, headers, payload, verify_ssl)
+    rest = get_rest_data(method, resource, auth, headers, payload, verify_ssl, stale_time)
     rest.update()
 
     if rest.data is None:
         _LOGGER.error("Unable to fetch REST data")
         return False
 
-    add_devices([JSONRestSensor(hass, rest, name, unit, value_template)])
+    sensor = JSONRestSensor(hass, rest, name, unit, value_template, json_path, json_attributes)
+    # the data was fetched above, only process it here
+    sensor._process_data()
+    add_devices([sensor])
+
+
+async def async_setup_platform(hass, config, async_add_devices, discovery_info=None):
+    """Set up the RESTful sensor, polling it from the event loop if async is set."""
+    if not config.get(CONF_ASYNC) or \
+            config.get(CONF_AUTHENTICATION) == HTTP_DIGEST_AUTHENTICATION:
+        if config.get(CONF_ASYNC):
+            _LOGGER.warning("Digest authentication is not supported in async mode. Using the sync sensor")
+
+        def add_devices(devices, update_before_add=False):
+            hass.add_job(async_add_devices, devices, update_before_add)
+
+        return await hass.async_add_executor_job(
+            setup_platform, hass, config, add_devices, discovery_info)
+
+    name = config.get(CONF_NAME)
+    resource = config.get(CONF_RESOURCE)
+    method = config.get(CONF_METHOD)
+    payload = config.get(CONF_PAYLOAD)
+    verify_ssl = config.get(CONF_VERIFY_SSL)
+    username = config.get(CONF_USERNAME)
+    password = config.get(CONF_PASSWORD)
+    headers = config.get(CONF_HEADERS)
+    unit = config.get(CONF_UNIT_OF_MEASUREMENT)
+    value_template = config.get(CONF_VALUE_TEMPLATE)
+    json_path = config.get(CONF_JSON_PATH)
+    json_attributes = config.get(CONF_JSON_ATTRIBUTES)
+    stale_time = config.get(CONF_STALE_WHILE_REVALIDATE)
+    if value_template is not None:
+        value_template.hass = hass
+
+    if username and password:
+        auth = aiohttp.BasicAuth(username, password)
+    else:
+        auth = None
+    rest = get_rest_data(method, resource, auth, headers, payload, verify_ssl, stale_time,
+                         factory=lambda: AsyncJSONRestData(
+                             hass, method, resource, auth, headers, payload, verify_ssl,
+                             stale_time))
+    await rest.async_update()
+
+    if rest.data is None:
+        _LOGGER.error("Unable to fetch REST data")
+        return False
+
+    sensor = AsyncJSONRestSensor(hass, rest, name, unit, value_template, json_path,
+                                 json_attributes)
+    # the data was fetched above, only process it here
+    await sensor._async_process_data()
+    async_add_devices([sensor])
+
+
+def get_rest_data(method, resource, auth, headers, payload, verify_ssl, stale_time, factory=None):
+    """Return the JSONRestData for this request, creating it if no other sensor uses it yet."""
+    auth_key = None
+    if auth is not None:
+        # sensors with different credentials or auth schemes must not share a reply
+        auth_key = (type(auth).__name__, getattr(auth, 'username', getattr(auth, 'login', None)),
+                    auth.password)
+    key = (method, resource, payload, verify_ssl, stale_time, factory is not None, auth_key,
+           tuple(sorted((headers or {}).items())))
+    with _FETCHERS_LOCK:
+        if key not in _FETCHERS:
+            if factory is None:
+                _FETCHERS[key] = JSONRestData(method, resource, auth, headers, payload, verify_ssl,
+                                              stale_time)
+            else:
+                _FETCHERS[key] = factory()
+        else:
+            _LOGGER.debug("Sharing REST data for %s %s", method, resource)
+        return _FETCHERS[key]
+
+
+def parse_json_path(path):
+    """Split a dotted path (a.b.0) or a JSON pointer (/a/b/0) into its keys."""
+    if path.startswith('/'):
+        return [key.replace('~1', '/').replace('~0', '~') for key in path[1:].split('/')]
+    return path.split('.')
+
+
+class _Utf8Reader(object):
+    """Hand the text to ijson as UTF-8 bytes, one chunk at a time, without encoding a full copy."""
+
+    def __init__(self, text):
+        self._text = text
+        self._pos = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = len(self._text) - self._pos
+        chunk = self._text[self._pos:self._pos + size]
+        self._pos += len(chunk)
+        return chunk.encode('utf-8')
+
+
+def select_json_paths(text, paths):
+    """Return {path: value} for the (path, keys) pairs found in the JSON text.
+
+    With ijson installed and paths made only of plain object keys, the text is
+    parsed as a stream and only the selected parts of the document are built.
+    """
+    # ijson prefixes join the keys with dots and name array elements 'item', so
+    # keys like that can't be told apart in the stream: parse the whole document
+    if ijson is None or any(not key or key.isdigit() or '.' in key or key == 'item'
+                            for _, keys in paths for key in keys):
+        document = json.loads(text)
+        return {path: extract_json_path(document, keys) for path, keys in paths}
+
+    wanted = set('.'.join(keys) for _, keys in paths)
+    # ijson prefix -> value
+    selected = {}
+    # ijson prefix -> [builder, nesting depth] for the containers being built
+    building = {}
+    try:
+        for prefix, event, value in ijson.parse(_Utf8Reader(text), use_float=True):
+            for key, entry in list(building.items()):
+                entry[0].event(event, value)
+                if event in ('start_map', 'start_array'):
+                    entry[1] += 1
+                elif event in ('end_map', 'end_array'):
+                    entry[1] -= 1
+                    if entry[1] == 0:
+                        selected[key] = entry[0].value
+                        del building[key]
+
+            if prefix in wanted and prefix not in selected and prefix not in building:
+                if event in ('start_map', 'start_array'):
+                    builder = ijson.ObjectBuilder()
+                    builder.event(event, value)
+                    building[prefix] = [builder, 1]
+                elif event not in ('map_key', 'end_map', 'end_array'):
+                    selected[prefix] = value
+
+            if len(selected) == len(wanted):
+                # everything was found, skip the rest of the reply
+                break
+    except ijson.JSONError as err:
+        raise ValueError(err)
+
+    return {path: selected.get('.'.join(keys)) for path, keys in paths}
+
+
+def extract_json_path(document, keys):
+    """Return the part of the document found at keys, or None if it is not there."""
+    for key in keys:
+        if isinstance(document, dict):
+            document = document.get(key)
+        elif isinstance(document, list):
+            try:
+                document = document[int(key)]
+            except (ValueError, IndexError):
+                return None
+        else:
+            return None
+        if document is None:
+            return None
+    return document
 
 
 class JSONRestSensor(Entity):
     """Implementation of a REST sensor."""
 
-    def __init__(self, hass, rest, name, unit_of_measurement, value_template):
+    def __init__(self, hass, rest, name, unit_of_measurement, value_template, json_path=None,
+                 json_attributes=None):
         """Initialize the REST sensor."""
         self._hass = hass
         self.rest = rest
@@ -88,7 +288,9 @@ class JSONRestSensor(Entity):
         self._state = STATE_UNKNOWN
         self._unit_of_measurement = unit_of_measurement
         self._value_template = value_template
-        self.update()
+        self._raw_value = None
+        self._json_path = parse_json_path(json_path) if json_path else None
+        self._json_attributes = [(path, parse_json_path(path)) for path in json_attributes or []]
 
     @property
     def name(self):
@@ -108,36 +310,90 @@ class JSONRestSensor(Entity):
     def update(self):
         """Get the latest data from REST API and update the state."""
         self.rest.update()
+        self._process_data()
+
+    def _data_changed(self):
+        """Take the latest REST data, return False if it is the payload already processed."""
         value = self.rest.data
-        _LOGGER.debug("Raw REST data: %s" % value)
+        if value is not None and value == self._raw_value:
+            # same payload as last time (or 304 Not Modified), keep the current state and attributes
+            _LOGGER.debug("REST data unchanged, skipping update")
+            return False
+        self._raw_value = value
+        _LOGGER.debug("Raw REST data: %s", value)
+        return True
+
+    def _process_data(self):
+        """Update the state and attributes from the latest REST data."""
+        if not self._data_changed():
+            return
 
-        if value is None:
+        if self._raw_value is None:
             _LOGGER.debug("value is None -> state UNKNOWN")
-            value = STATE_UNKNOWN
-        elif self._value_template is not None:
+            self._state = STATE_UNKNOWN
+            self._attributes = {}
+            return
+
+        if self._json_path is not None:
+            value = self._update_from_path()
+        else:
+            value = self._raw_value
+
+        if self._value_template is not None:
             value = self._value_template.render_with_possible_json_value(
                 value, STATE_UNKNOWN)
 
+        if self._json_path is None:
+            self._update_attributes(value)
+        self._update_state(value)
+
+    def _update_state(self, value):
+        """Set the state from the (rendered) value."""
         self._state = value
         # if the attributes were parsed, set the state as STATE_ON as a workaround for HA 0.57 state limit
-        if len(value) >= 255:
+        if self._json_path is None and len(value) >= 255:
             _LOGGER.debug("value > 255. Setting STATE_ON instead")
             self._state = STATE_ON
-	
+
+    def _update_attributes(self, value):
         """ Parse the return text as JSON and save the json as an attribute. """
         try:
             _LOGGER.debug("Parsing attributes...")
-            attributes = json.loads(value)
+            if self._json_attributes:
+                # only keep the configured parts of the reply
+                attributes = select_json_paths(self._raw_value, self._json_attributes)
+            elif self._value_template is None:
+                # the raw reply, already parsed once for all the sensors sharing it
+                attributes = self.rest.decode(self._raw_value)
+            else:
+                attributes = json.loads(value)
             if isinstance(attributes, list):
                 _LOGGER.debug("Parsed attributes form a list. Adding it as 'list'")
-                self._attributes['list'] = attributes
+                # copy first, the previous attributes may be shared with other sensors
+                self._attributes = dict(self._attributes, list=attributes)
             else:
                 _LOGGER.debug("Attributes are not a list. Hopefully they are a dict")
                 self._attributes = attributes
-        except json.JSONDecodeError:
+        except ValueError:
             _LOGGER.debug("Error decoding JSON. Resetting attributes")
             self._attributes = {}  
 
+    def _update_from_path(self):
+        """Set the attributes from the part of the shared reply at json_path, return the state value."""
+        try:
+            value = extract_json_path(self.rest.decode(self._raw_value), self._json_path)
+        except json.JSONDecodeError:
+            _LOGGER.debug("Error decoding JSON. Resetting attributes")
+            value = None
+
+        if isinstance(value, dict):
+            self._attributes = value
+            return STATE_ON
+        elif isinstance(value, list):
+            self._attributes = {'list': value}
+            return STATE_ON
+        self._attributes = {}
+        return STATE_UNKNOWN if value is None else str(value)
 
     @property
     def state_attributes(self):
@@ -152,21 +408,223 @@ class JSONRestSensor(Entity):
 class JSONRestData(object):
     """Class for handling the data retrieval."""
 
-    def __init__(self, method, resource, auth, headers, data, verify_ssl):
+    def __init__(self, method, resource, auth, headers, data, verify_ssl, stale_time):
         """Initialize the data object."""
         self._request = requests.Request(
             method, resource, headers=headers, auth=auth, data=data).prepare()
         self._verify_ssl = verify_ssl
+        # keep the connection to the resource alive between polls
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+        self._init_state(stale_time)
+
+    def _init_state(self, stale_time):
+        """Initialize the caching and failure tracking state."""
+        self._etag = None
+        self._last_modified = None
+        self._last_fetch = None
+        # (reply, decoded reply), replaced as a whole so concurrent sensors never mix them up
+        self._json = None
+        self._stale_time = stale_time.total_seconds()
+        self._last_success = None
+        self._failures = 0
+        self._retry_at = 0
         self.data = None
 
+    def _circuit_open(self):
+        """Return True while a failing resource should not be queried."""
+        if self._failures and time.monotonic() < self._retry_at:
+            _LOGGER.debug("Skipping %s after %d failures, retrying in %.0f seconds",
+                          self._describe(), self._failures, self._retry_at - time.monotonic())
+            self._expire_stale()
+            return True
+        return False
+
+    def _record_success(self):
+        """Close the circuit after a successful request."""
+        if self._failures:
+            _LOGGER.info("Resource %s is back after %d failures", self._describe(), self._failures)
+        self._failures = 0
+        self._last_success = time.monotonic()
+
+    def _record_failure(self):
+        """Back off exponentially and keep the last good data while it is fresh enough."""
+        self._failures += 1
+        backoff = min(FAILURE_BACKOFF * 2 ** (self._failures - 1), MAX_FAILURE_BACKOFF)
+        self._retry_at = time.monotonic() + backoff
+        if self._failures == 1:
+            _LOGGER.error("Error fetching data: %s", self._describe())
+        else:
+            _LOGGER.debug("Error fetching data: %s (%d failures, next try in %d seconds)",
+                          self._describe(), self._failures, backoff)
+        self._expire_stale()
+
+    def _expire_stale(self):
+        """Drop the last good data once it is older than the stale_while_revalidate window."""
+        if self.data is not None and \
+                (self._last_success is None or
+                 time.monotonic() - self._last_success > self._stale_time):
+            self.data = None
+
+    def _describe(self):
+        """Return the request, for log messages."""
+        return self._request
+
+    def decode(self, data):
+        """Return the reply decoded as JSON, parsing it only once per reply."""
+        cached = self._json
+        if cached is None or cached[0] is not data:
+            cached = (data, json.loads(data))
+            self._json = cached
+        return cached[1]
+
     def update(self):
+        """Get the latest data, unless another sensor sharing it just did."""
+        with self._lock:
+            if self._last_fetch is not None and \
+                    time.monotonic() - self._last_fetch < MIN_TIME_BETWEEN_FETCHES:
+                return
+            if self._circuit_open():
+                return
+            self._fetch()
+            self._last_fetch = time.monotonic()
+
+    def _fetch(self):
         """Get the latest data from REST service with provided method."""
-        try:
-            with requests.Session() as sess:
-                response = sess.send(
-                    self._request, timeout=10, verify=self._verify_ssl)
+        # revalidate the cached reply instead of downloading it again
+        self._request.headers.pop('If-None-Match', None)
+        self._request.headers.pop('If-Modified-Since', None)
+        if self.data is not None:
+            if self._etag:
+                self._request.headers['If-None-Match'] = self._etag
+            if self._last_modified:
+                self._request.headers['If-Modified-Since'] = self._last_modified
 
-            self.data = response.text
+        try:
+            response = self._session.send(
+                self._request, timeout=10, verify=self._verify_ssl)
         except requests.exceptions.RequestException:
-            _LOGGER.error("Error fetching data: %s", self._request)
-            self.data = None
+            self._record_failure()
+            return
+
+        if response.status_code == 304:
+            self._record_success()
+            _LOGGER.debug("Resource not modified: %s", self._request.url)
+            return
+        if not response.ok:
+            # an error reply must not replace the last good data
+            _LOGGER.debug("HTTP error %s from %s", response.status_code, self._request.url)
+            self._record_failure()
+            return
+
+        self._record_success()
+        self._etag = response.headers.get('ETag')
+        self._last_modified = response.headers.get('Last-Modified')
+        self.data = response.text
+
+
+class AsyncJSONRestSensor(JSONRestSensor):
+    """Implementation of a REST sensor polled from the event loop."""
+
+    async def async_update(self):
+        """Get the latest data from REST API and update the state."""
+        await self.rest.async_update()
+        await self._async_process_data()
+
+    async def _async_process_data(self):
+        """Update the state and attributes, parsing the JSON in the executor and rendering on the loop."""
+        if not self._data_changed():
+            return
+
+        if self._raw_value is None:
+            _LOGGER.debug("value is None -> state UNKNOWN")
+            self._state = STATE_UNKNOWN
+            self._attributes = {}
+            return
+
+        if self._json_path is not None:
+            value = await self._hass.async_add_executor_job(self._update_from_path)
+        else:
+            value = self._raw_value
+
+        if self._value_template is not None:
+            value = self._value_template.async_render_with_possible_json_value(
+                value, STATE_UNKNOWN)
+
+        if self._json_path is None:
+            await self._hass.async_add_executor_job(self._update_attributes, value)
+        self._update_state(value)
+
+
+class AsyncJSONRestData(JSONRestData):
+    """Class for handling the data retrieval with a non-blocking HTTP client."""
+
+    def __init__(self, hass, method, resource, auth, headers, data, verify_ssl, stale_time):
+        """Initialize the data object."""
+        self._websession = async_get_clientsession(hass, verify_ssl)
+        self._method = method
+        self._resource = resource
+        self._auth = auth
+        self._headers = headers or {}
+        self._payload = data
+        self._timeout = aiohttp.ClientTimeout(total=10)
+        self._lock = asyncio.Lock()
+        self._init_state(stale_time)
+
+    def _describe(self):
+        """Return the request, for log messages."""
+        return self._method + " " + self._resource
+
+    async def async_update(self):
+        """Get the latest data, unless another sensor sharing it just did."""
+        global _REQUESTS_SEMAPHORE
+        if _REQUESTS_SEMAPHORE is None:
+            _REQUESTS_SEMAPHORE = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+        # a single request in flight per resource, and a bounded number overall
+        async with self._lock:
+            if self._last_fetch is not None and \
+                    time.monotonic() - self._last_fetch < MIN_TIME_BETWEEN_FETCHES:
+                return
+            if self._circuit_open():
+                return
+            async with _REQUESTS_SEMAPHORE:
+                await self._async_fetch()
+            self._last_fetch = time.monotonic()
+
+    async def _async_fetch(self):
+        """Get the latest data from REST service with provided method."""
+        headers = dict(self._headers)
+        # revalidate the cached reply instead of downloading it again
+        if self.data is not None:
+            if self._etag:
+                headers['If-None-Match'] = self._etag
+            if self._last_modified:
+                headers['If-Modified-Since'] = self._last_modified
+
+        try:
+            async with self._websession.request(
+                    self._method, self._resource, headers=headers, data=self._payload,
+                    auth=self._auth, timeout=self._timeout) as response:
+
+                if response.status == 304:
+                    self._record_success()
+                    _LOGGER.debug("Resource not modified: %s", self._resource)
+                    return
+                if response.status >= 400:
+                    # an error reply must not replace the last good data
+                    _LOGGER.debug("HTTP error %s from %s", response.status, self._resource)
+                    self._record_failure()
+                    return
+
+                data = await response.text()
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self._record_failure()
+            return
+
+        self._record_success()
+        self._etag = etag
+        self._last_modified = last_modified
+        self.data = data
@@ -3,13 +3,14 @@ import paho.mqtt.client as mqtt
 import odroid_wiringpi as wpi
 import yaml
 import sys
-import threading
 import time
+from deadline_scheduler import scheduler
 
 # Prerequisites:
 # * pip: sudo apt-get install python-pip 
 # * wiringPi: http://odroid.com/dokuwiki/doku.php?id=en:c1_tinkering#python_example
 # * paho-mqtt: pip3 install paho-mqtt pyyaml
+# * deadline_scheduler.py from this directory, installed next to this script
 
 # Configuration file goes in /etc/blind-cover-mqtt-agent.yaml and should contain your mqtt broker details
 
@@ -52,7 +53,6 @@ coverDirectionDown = 0 #the cover should lower
 
 coverOperationTime = 18 #maximum time in seconds for the motor to raise or lower the cover from start to finish
 
-activeTimer = None #reference to an active timer
 currentposition = 100 # assume the default state of the blinds to be open. 0 is closed
 lastDirection = 0 # remeber the direction you're going (up = 1, down = 0)
 startTime = int(round(time.time() * 1000)) #remember when starting the motor
@@ -133,12 +133,11 @@ def runtime2position(runtime):
     return newposition
 
 def runMotor(duration, direction):
-    global activeTimer, startTime, lastDirection
+    global startTime, lastDirection
     print("Running the motor for " + str(duration) + " seconds in direction " + str(direction))
     sys.stdout.flush()
     # turn off any active timers
-    if activeTimer:
-        activeTimer.cancel()
+    scheduler.cancel('motor')
     # set direction first.
     wpi.digitalWrite(coverDirectionPin, direction)
     # set the cover to be controlled by the Odroid
@@ -152,21 +151,20 @@ def runMotor(duration, direction):
     else:
         client.publish('ha/blind_cover/get', "closing", 0, False)
 
-    # start a thread to wait for the operation to complete and schedule a timer to finish it.
+    # schedule a deadline to finish the operation.
     lastDirection = direction
     if duration == coverOperationTime:
         # full run up or down
         if direction:
-            activeTimer = threading.Timer(duration, stopBlinds, ["open"])
+            scheduler.schedule('motor', duration, stopBlinds, "open")
         else:
-            activeTimer = threading.Timer(duration, stopBlinds, ["closed"])
+            scheduler.schedule('motor', duration, stopBlinds, "closed")
     else:
         # partial control - we don't know the final position of the blinds
-        activeTimer = threading.Timer(duration, stopBlinds, ["unknown"])
-    activeTimer.start()
+        scheduler.schedule('motor', duration, stopBlinds, "unknown")
 
 def processCommand(state):
-    global activeTimer, startTime, lastDirection
+    global startTime, lastDirection
     print("Setting cover "+str(state, 'utf-8'))
     sys.stdout.flush()
 
@@ -180,8 +178,7 @@ def processCommand(state):
 
     elif state == 'STOP'.encode('utf-8'):
         # we need to close - turn off any active timers
-        if activeTimer:
-            activeTimer.cancel()
+        scheduler.cancel('motor')
         # call stopBlinds immediately
         stopBlinds("unknown")
 
@@ -191,7 +188,7 @@ def processCommand(state):
         sys.stdout.flush()
 
 def stopBlinds(action):
-    global activeTimer, startTime, currentposition
+    global startTime, currentposition
     # we need to put the cover back in manual mode for the physical switch to work
     wpi.digitalWrite(coverModePin, coverModeManual)
     stopTime = int(round(time.time() * 1000))  # time in ms
@@ -200,7 +197,6 @@ def stopBlinds(action):
     print("Publishing new state ha/blind_cover/get: {}".format(action))
     client.publish('ha/blind_cover/get', action, 0, False)
     sys.stdout.flush()
-    activeTimer = None
     if action != "open" and action != "closed":
         #calculate how much time the blind has worked
         runtime = int((stopTime - startTime)/1000)
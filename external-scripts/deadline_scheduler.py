@@ -0,0 +1,97 @@
+#!/usr/bin/python
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+# A single background thread running callbacks at deadlines, shared by the agents.
+# Install it next to the agents (e.g. /usr/local/bin/deadline_scheduler.py).
+#
+# Replaces the "cancel the threading.Timer and start a new one" pattern: scheduling
+# an existing key again only moves its deadline, no thread is created or destroyed.
+
+_now = getattr(time, 'monotonic', time.time)
+
+
+class DeadlineScheduler(object):
+    """ Run callbacks at deadlines, one pending deadline per key """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        # heap of (deadline, sequence, key). Entries can be stale, the real deadline is in _pending
+        self._heap = []
+        # key -> [deadline, callback, args]
+        self._pending = {}
+        self._sequence = itertools.count()
+        self._thread = None
+
+    def schedule(self, key, delay, callback, *args):
+        """ Run callback(*args) in delay seconds, replacing any pending deadline for key.
+            Returns True if key was already pending (its deadline was moved) """
+        deadline = _now() + delay
+        with self._cond:
+            entry = self._pending.get(key)
+            if entry is not None:
+                previous = entry[0]
+                entry[:] = [deadline, callback, args]
+                if deadline >= previous:
+                    # the existing heap entry wakes the thread early, it will reschedule itself
+                    return True
+            else:
+                self._pending[key] = [deadline, callback, args]
+            heapq.heappush(self._heap, (deadline, next(self._sequence), key))
+            self._start()
+            self._cond.notify()
+            return entry is not None
+
+    def cancel(self, key):
+        """ Drop the pending deadline for key, if any. Returns True if there was one """
+        with self._cond:
+            return self._pending.pop(key, None) is not None
+
+    def isScheduled(self, key):
+        with self._cond:
+            return key in self._pending
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='DeadlineScheduler')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    deadline, sequence, key = self._heap[0]
+                    entry = self._pending.get(key)
+                    if entry is None:
+                        # cancelled or already run
+                        heapq.heappop(self._heap)
+                        continue
+                    if entry[0] > deadline:
+                        # the deadline was extended, move the heap entry
+                        heapq.heapreplace(self._heap, (entry[0], sequence, key))
+                        continue
+                    now = _now()
+                    if deadline > now:
+                        self._cond.wait(deadline - now)
+                        continue
+                    heapq.heappop(self._heap)
+                    del self._pending[key]
+                    callback, args = entry[1], entry[2]
+                    break
+            # run the callback outside the lock, it may schedule again
+            try:
+                callback(*args)
+            except Exception:
+                # keep the scheduler alive for the other deadlines
+                traceback.print_exc()
+
+
+# the scheduler shared by everything in the process
+scheduler = DeadlineScheduler()
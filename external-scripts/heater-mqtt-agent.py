@@ -3,12 +3,13 @@ from __future__ import print_function  # Only needed for Python 2
 import paho.mqtt.client as mqtt
 import sys
 import yaml
-import os
+import sysfs_gpio
 
 # Prerequisites:
 # * pip: sudo apt-get install python-pip
 # * paho-mqtt: pip install paho-mqtt
 # * python-yaml: sudo apt-get install python-yaml
+# * sysfs_gpio.py from this directory, installed next to this script
 
 # Configuration file goes in /etc/heater-mqtt-agent.yaml and should contain your mqtt broker details
 
@@ -34,18 +35,13 @@ def parseConfig():
             print("Unable to parse configuration file /etc/heater-mqtt-agent.yaml")
             sys.exit(1)
 
-# Export the pin and set direction
+# Export the pin and set direction (done once, the value file stays open)
 def pinMode(pinNumber, value):
-    if not os.path.isdir("/sys/class/gpio/gpio" + str(pinNumber)):
-        with open("/sys/class/gpio/export", 'w') as export:
-            print(pinNumber, file=export)
-    with open("/sys/class/gpio/gpio" + str(pinNumber) + "/direction", 'w') as direction:
-        print(value, file=direction)
+    sysfs_gpio.getGpio(pinNumber, value)
 
 # Write a 1 or a 0 to the pin
 def digitalWrite(pinNumber, value):
-    with open("/sys/class/gpio/gpio" + str(pinNumber) + "/value", 'w') as val:
-        print(value, file=val)
+    sysfs_gpio.getGpio(pinNumber, 'out').write(value)
 
 # The callback for when the client receives a CONNACK response from the server.
 def on_connect(client, userdata, flags, rc):
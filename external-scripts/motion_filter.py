@@ -0,0 +1,88 @@
+#!/usr/bin/python
+import collections
+import time
+
+# Debounce/hysteresis stage for noisy binary sensors (PIRs), shared by the pir agents.
+# Install it next to the agents (e.g. /usr/local/bin/motion_filter.py).
+#
+# Raw samples go through three steps before they change the filtered state:
+#  * majority vote over the last 'samples' readings
+#  * the voted value must stay the same for 'stableTime' seconds
+#  * the filtered state changes at most once every 'minInterval' seconds
+# With the defaults (1 sample, 0 seconds) the filtered state follows the raw value.
+#
+# Time can be passed in explicitly, so recorded traces can be replayed in tests:
+#   f = MotionFilter(samples=3, stableTime=2)
+#   [f.update(value, t) for (t, value) in trace]
+
+_now = getattr(time, 'monotonic', time.time)
+
+
+class MotionFilter(object):
+    """ Turn raw motion samples into a filtered, rate limited motion state """
+
+    def __init__(self, samples=1, stableTime=0, minInterval=0, initial=False):
+        self.samples = collections.deque(maxlen=max(1, int(samples)))
+        self.stableTime = float(stableTime)
+        self.minInterval = float(minInterval)
+        self.state = initial
+        self._candidateSince = None
+        self._lastChange = None
+
+    @classmethod
+    def fromConfig(cls, conf):
+        """ Build a filter from the debounceSamples/debounceTime/minPublishInterval settings """
+        return cls(samples=conf.get('debounceSamples', 1),
+                   stableTime=conf.get('debounceTime', 0),
+                   minInterval=conf.get('minPublishInterval', 0))
+
+    def update(self, value, now=None):
+        """ Add a raw sample and return the filtered state """
+        self.samples.append(bool(value))
+        return self.check(now)
+
+    def check(self, now=None):
+        """ Re-evaluate the filtered state without a new sample (e.g. when a deadline passes) """
+        if now is None:
+            now = _now()
+
+        voted = sum(self.samples) * 2 > len(self.samples)
+        if voted == self.state:
+            self._candidateSince = None
+            return self.state
+
+        if self._candidateSince is None:
+            self._candidateSince = now
+        if now - self._candidateSince < self.stableTime:
+            return self.state
+        if self._lastChange is not None and now - self._lastChange < self.minInterval:
+            return self.state
+
+        self.state = voted
+        self._lastChange = now
+        self._candidateSince = None
+        return self.state
+
+    def reset(self, value, now=None):
+        """ Force the filtered state, e.g. when the agent itself decides motion is over """
+        self.samples.clear()
+        self.samples.append(bool(value))
+        self.state = bool(value)
+        self._candidateSince = None
+        self._lastChange = _now() if now is None else now
+
+    def discard(self):
+        """ Forget the samples and any pending change, keeping the filtered state """
+        self.samples.clear()
+        self._candidateSince = None
+
+    def nextCheck(self, now=None):
+        """ Seconds until a pending change could be accepted, or None if nothing is pending """
+        if self._candidateSince is None:
+            return None
+        if now is None:
+            now = _now()
+        wait = self._candidateSince + self.stableTime - now
+        if self._lastChange is not None:
+            wait = max(wait, self._lastChange + self.minInterval - now)
+        return max(0, wait)
@@ -4,14 +4,17 @@ import re
 import time
 import sys
 import yaml
-import os
+import select
 import logging 
+import sysfs_gpio
+from motion_filter import MotionFilter
 from logging.config import dictConfig
 
 # Prerequisites:
 # * pip: sudo apt-get install python-pip
 # * paho-mqtt: pip install paho-mqtt
 # * python-yaml: sudo apt-get install python-yaml
+# * sysfs_gpio.py and motion_filter.py from this directory, installed next to this script
 
 # Configuration file goes in /etc/pir-mqtt-agent-sysfs.yaml and should contain your mqtt broker details
 
@@ -41,10 +44,6 @@ logging_config = dict(
 dictConfig(logging_config)
 logger = logging.getLogger(__name__)
 
-oldValue = False
-timer_start = 0
-motion_detected = False
-
 """ Parse and load the configuration file to get MQTT credentials """
 
 conf = {}
@@ -62,43 +61,89 @@ def parseConfig():
             logger.fatal(f"Unable to parse configuration file {config_file}")
             sys.exit(1)
 
-def getFilename(gpio):
-    gpio = str(gpio)
-    return f"/sys/class/gpio/gpio{gpio}/value"
+def getGpioRoot():
+    # can be pointed to a fake sysfs tree for testing
+    return conf.get('sysfsRoot', sysfs_gpio.SYSFS_ROOT)
+
 
+""" Setup sensor, if needed, and return it with its value file kept open """
+def setupSensor(gpio):
+    logger.debug(f"Setting up GPIO {gpio}")
+    return sysfs_gpio.getGpio(gpio, 'in', getGpioRoot())
 
 """ Read sensor from sysfs and return it as a bool """
-def readSensor(gpio):
-    with open(getFilename(gpio)) as f:
-         contents = f.read()
-         return bool(int(contents))
+def readSensor(sensor):
+    return sensor.read()
+
+""" Ask the kernel to signal both edges on the value file. Returns False if not supported """
+def setupEdge(sensor):
+    if sensor.setEdge("both"):
+        return True
+    logger.warning(f"Edge detection not available on GPIO {sensor.gpio}. Falling back to polling")
+    return False
+
+""" Wait for an edge on the value file, up to timeout seconds (None waits forever) """
+def waitForEdge(poller, timeout):
+    poller.poll(None if timeout is None else max(0, int(timeout * 1000)))
+
+""" Build the list of sensors. A single sensor can still be configured with the top level gpio/mqttTopic keys """
+def getSensors():
+    sensors = conf.get('sensors') or [{'gpio': conf['gpio'], 'mqttTopic': conf['mqttTopic']}]
+    for sensor in sensors:
+        # per sensor settings default to the top level ones
+        for key in ('mqttPersistent', 'persistence', 'sleep', 'edge',
+                    'debounceSamples', 'debounceTime', 'minPublishInterval'):
+            if key not in sensor and key in conf:
+                sensor[key] = conf[key]
+        sensor['gpioObj'] = setupSensor(sensor['gpio'])
+        sensor['useEdges'] = sensor.get('edge', True) and setupEdge(sensor['gpioObj'])
+        sensor['filter'] = MotionFilter.fromConfig(sensor)
+        sensor['motion_detected'] = False
+        sensor['timer_start'] = 0
+    return sensors
+
+""" Read one sensor, publish any change and return how long it can wait (None for an edge) """
+def processSensor(sensor):
+   # Poll the motion sensor and debounce it
+   raw = readSensor(sensor['gpioObj'])
+   motion = sensor['filter'].update(raw)
+   logger.debug(f"Sensor {sensor['gpio']} value {raw}, filtered {motion}")
+
+   if motion and not sensor['motion_detected']:
+       # Motion detected and previously not detected
+       logger.info(f"Motion detected on {sensor['mqttTopic']}")
+       sensor['motion_detected'] = True
+       sensor['timer_start'] = time.time()
+       client.publish(sensor['mqttTopic'], '1', 0, sensor['mqttPersistent'])
 
-""" Setup sensor, if needed """
-def setupSensor(gpio):
-   logger.debug(f"Setting up GPIO {gpio}")
-   # Convert the input to string
-   gpio = str(gpio)
-   
-   # Define the GPIO directory
-   gpio_dir = f"/sys/class/gpio/gpio{gpio}"
-   
-   # Check if the directory exists
-   if not os.path.isdir(gpio_dir):
-       # If it doesn't exist, export the GPIO
-       logger.debug(f"Exporting {gpio}")
-       with open("/sys/class/gpio/export", "w") as f:
-           f.write(gpio)
-       
-   # Define the direction file
-   direction_file = f"{gpio_dir}/direction"
-   
-   # Write to the direction file
-   with open(direction_file, "w") as f:
-       f.write("in")
+   elif not motion and sensor['motion_detected']:
+       # No motion detected but previously was
+       if time.time() - sensor['timer_start'] < int(sensor['persistence']):
+           # Still within hysteresis time
+           logger.debug('Motion detected (hysterezis period)')
+       else:
+           # Outside hysteresis time
+           logger.debug(f"No motion detected on {sensor['mqttTopic']}")
+           sensor['motion_detected'] = False
+           client.publish(sensor['mqttTopic'], '0', 0, sensor['mqttPersistent'])
+
+   timeouts = [sensor['filter'].nextCheck()]
+   if not sensor['useEdges']:
+       timeouts.append(sensor['sleep'])
+   elif sensor['motion_detected'] and not motion:
+       # wake up on the next edge or when the hysteresis period runs out
+       timeouts.append(int(sensor['persistence']) - (time.time() - sensor['timer_start']))
+   timeouts = [timeout for timeout in timeouts if timeout is not None]
+   # also wake up when a debounced change is due
+   return min(timeouts) if timeouts else None
 
 """ Initialize the MQTT object and connect to the server """
 parseConfig()
-setupSensor(conf['gpio'])
+sensors = getSensors()
+# one poll() on all the GPIOs at once
+poller = select.poll()
+for sensor in sensors:
+    poller.register(sensor['gpioObj'].fileno(), sensor['gpioObj'].pollEvents())
 
 client = mqtt.Client()
 if conf['mqttUser'] and conf['mqttPass']:
@@ -111,27 +156,6 @@ client.loop_start()
 
 
 while True:
-   # Poll the motion sensor
-   motion = readSensor(conf['gpio'])
-   logger.debug(f"Sensor value {motion}")
-   
-   if motion and not motion_detected:
-       # Motion detected and previously not detected
-       logger.info('Motion detected')
-       motion_detected = True
-       timer_start = time.time()
-       client.publish(conf['mqttTopic'], '1', 0, conf['mqttPersistent'])  
-       
-   elif not motion and motion_detected:
-       # No motion detected but previously was
-       if time.time() - timer_start < int(conf['persistence']):
-           # Still within hysteresis time
-           logger.debug('Motion detected (hysterezis period)')
-       else:
-           # Outside hysteresis time
-           logger.debug('No motion detected')
-           motion_detected = False
-           client.publish(conf['mqttTopic'], '0', 0, conf['mqttPersistent'])  
-
-   time.sleep(conf['sleep'])
-
+   timeouts = [timeout for timeout in map(processSensor, sensors) if timeout is not None]
+   # sleep until an edge on any GPIO, or until the earliest sensor needs a look
+   waitForEdge(poller, min(timeouts) if timeouts else None)
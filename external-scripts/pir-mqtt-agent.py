@@ -5,12 +5,15 @@ import yaml
 import sys
 import threading
 import time
+from deadline_scheduler import scheduler
+from motion_filter import MotionFilter
 
 # Prerequisites:
 # * pip: sudo apt-get install python-pip 
 # * wiringPi: http://odroid.com/dokuwiki/doku.php?id=en:c2_tinkering#python_example
 # * paho-mqtt: pip install paho-mqtt
 # * python-yaml: sudo apt-get install python-yaml
+# * deadline_scheduler.py and motion_filter.py from this directory, installed next to this script
 
 # Configuration file goes in /etc/pir-mqtt-agent.yaml and should contain your mqtt broker details
 
@@ -35,35 +38,66 @@ def parseConfig():
             sys.exit(1)
 
 def processIRQ():
-    global activeTimer
     print("Servicing IRQ (movement detected)")
     sys.stdout.flush()
-    # if there's an active timer, extend it
-    if activeTimer:
+    # the IRQ fires on the rising edge, so the pin just went high
+    updateMotion(True)
+    return True
+
+def checkPin():
+    # the debounce time passed, motion is confirmed only if the pin is still high
+    updateMotion(wpi.digitalRead(conf["pin"]))
+
+# updateMotion runs in the wiringPi ISR thread and in the scheduler thread, stopMotion in the scheduler thread:
+# the motion filter, the deadlines and the published state are only changed while holding motionLock
+motionLock = threading.Lock()
+
+def updateMotion(level):
+    with motionLock:
+        _updateMotion(level)
+
+def _updateMotion(level):
+    # with debouncing, motion only counts once the pin was high for long enough
+    if not motionFilter.update(level):
+        wait = motionFilter.nextCheck()
+        if wait is not None:
+            print("Motion not confirmed yet")
+            # look at the pin again when the motion could be confirmed
+            scheduler.schedule('debounce', wait, checkPin)
+        else:
+            print("Motion not confirmed, the pin went low")
+        sys.stdout.flush()
+        return
+    scheduler.cancel('debounce')
+    # if there's a pending deadline, this just extends it
+    if scheduler.schedule('motion', int(conf['persistence']), stopMotion):
         print("Movement is persisting")
-        activeTimer.cancel()
     else:
-        # if no active timer, create one and send a MOVEMENT message
+        # if no pending deadline, send a MOVEMENT message
         print("New movement detected!")
         client.publish(conf['mqttTopic'], "MOVEMENT", 0, False)
-    activeTimer = threading.Timer(int(conf['persistence']), stopMotion)
-    activeTimer.start()
     sys.stdout.flush()
-    return True
 
 def stopMotion():
-    global activeTimer
-    client.publish(conf['mqttTopic'], "QUIET", 0, False)
-    print("All is quiet again")
-    activeTimer = None
-    sys.stdout.flush()
+    with motionLock:
+        if scheduler.isScheduled('motion'):
+            # an IRQ started a new motion period after this deadline fired, it isn't over
+            return
+        motionFilter.reset(False)
+        client.publish(conf['mqttTopic'], "QUIET", 0, False)
+        print("All is quiet again")
+        sys.stdout.flush()
 
 #initialize wiringPi
 wpi.wiringPiSetup()
 
 
 parseConfig()
-activeTimer = None #reference to an active timer
+# only rising edges raise IRQs, so there are no regular samples to vote on: debounceSamples is not used here
+if conf.get('debounceSamples', 1) != 1:
+    print("debounceSamples is ignored by pir-mqtt-agent, use debounceTime")
+motionFilter = MotionFilter(stableTime=conf.get('debounceTime', 0),
+                            minInterval=conf.get('minPublishInterval', 0))
 
 #initialize the pin - input
 wpi.pinMode(conf["pin"], 0)
@@ -0,0 +1,120 @@
+#!/usr/bin/python
+import os
+import select
+import stat
+import errno
+
+# Small helper for GPIOs exposed through /sys/class/gpio, shared by the sysfs agents.
+# Install it next to the agents (e.g. /usr/local/bin/sysfs_gpio.py).
+#
+# Each GPIO is exported and configured once, and its value file is kept open:
+# reads and writes are a single pread()/pwrite() on the open file descriptor
+# instead of building the path and calling open() every time.
+
+SYSFS_ROOT = '/sys/class/gpio'
+
+# already set up GPIOs, by (root, gpio)
+_gpios = {}
+
+
+def _pread(fd, size):
+    if hasattr(os, 'pread'):
+        return os.pread(fd, size, 0)
+    os.lseek(fd, 0, os.SEEK_SET)
+    return os.read(fd, size)
+
+
+def _pwrite(fd, data):
+    if hasattr(os, 'pwrite'):
+        return os.pwrite(fd, data, 0)
+    os.lseek(fd, 0, os.SEEK_SET)
+    return os.write(fd, data)
+
+
+class Gpio(object):
+    """ A sysfs GPIO with its value file kept open """
+
+    def __init__(self, gpio, direction, root=SYSFS_ROOT):
+        self.gpio = str(gpio)
+        self.root = root
+        self.path = root + "/gpio" + self.gpio
+        self.direction = direction
+        self.value = False
+
+        # Export the pin, if needed
+        if not os.path.isdir(self.path):
+            with open(root + "/export", 'w') as export:
+                export.write(self.gpio)
+
+        # Only touch the direction if it's not already right
+        direction_file = self.path + "/direction"
+        try:
+            with open(direction_file) as f:
+                current = f.read().strip()
+        except (IOError, OSError):
+            current = None
+        if current != direction:
+            with open(direction_file, 'w') as f:
+                f.write(direction)
+
+        flags = os.O_RDWR if direction == 'out' else os.O_RDONLY
+        self.fd = os.open(self.path + "/value", flags | os.O_NONBLOCK)
+        self.isFifo = stat.S_ISFIFO(os.fstat(self.fd).st_mode)
+        if self.isFifo and direction != 'out':
+            # fake sysfs for testing: keep a writer open too, so poll() doesn't spin on POLLHUP
+            self._writer = os.open(self.path + "/value", os.O_WRONLY | os.O_NONBLOCK)
+
+    def fileno(self):
+        return self.fd
+
+    def read(self):
+        """ Return the current value as a bool """
+        if self.isFifo:
+            # fake sysfs: each write to the FIFO is a new value, nothing written means no change
+            try:
+                contents = os.read(self.fd, 64).split()
+            except OSError as exc:
+                if exc.errno != errno.EAGAIN:
+                    raise
+                contents = []
+            if contents:
+                self.value = bool(int(contents[-1]))
+            return self.value
+        self.value = bool(int(_pread(self.fd, 8)))
+        return self.value
+
+    def write(self, value):
+        """ Write a 1 or a 0 to the pin """
+        data = b'1\n' if int(value) else b'0\n'
+        if self.isFifo:
+            os.write(self.fd, data)
+        else:
+            _pwrite(self.fd, data)
+        self.value = bool(int(value))
+
+    def setEdge(self, edge):
+        """ Ask the kernel to signal edges on the value file. Returns False if not supported """
+        try:
+            with open(self.path + "/edge", 'w') as f:
+                f.write(edge)
+            return True
+        except (IOError, OSError):
+            return False
+
+    def pollEvents(self):
+        """ The poll() events that signal a change on this GPIO """
+        # sysfs signals edges with POLLPRI, a FIFO (fake sysfs) with POLLIN
+        return (select.POLLIN if self.isFifo else select.POLLPRI) | select.POLLERR
+
+    def close(self):
+        os.close(self.fd)
+
+
+def getGpio(gpio, direction, root=SYSFS_ROOT):
+    """ Return the set up GPIO, exporting and opening it on first use """
+    key = (root, str(gpio))
+    if key not in _gpios or _gpios[key].direction != direction:
+        if key in _gpios:
+            _gpios[key].close()
+        _gpios[key] = Gpio(gpio, direction, root)
+    return _gpios[key]
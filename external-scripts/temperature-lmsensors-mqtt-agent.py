@@ -19,7 +19,12 @@ import sensors
 #  sudo systemctl enable temperature-lmsensors-mqtt-agent
 #  sudo systemctl start temperature-lmsensors-mqtt-agent
 
+# last published value and time, per chip/sensor
 oldValue = {}
+lastPublished = {}
+# resolved lm-sensors features, per chip/sensor
+features = {}
+lastResolve = 0
 
 """ Parse and load the configuration file to get MQTT credentials """
 
@@ -38,22 +43,51 @@ def parseConfig():
             sys.exit(1)
 
 
-""" Read temperature from sysfs and return it as a string """
+""" Map every configured chip/sensor to its lm-sensors feature, walking the chips only once """
 
 
-def readSensor(chipName, sensorName):
+def resolveSensors():
+    global features, lastResolve
+    wanted = set((sensor['chip'], sensor['sensor']) for sensor in conf['sensors'])
+    features = {}
+    lastResolve = time.time()
     try:
         for chip in sensors.iter_detected_chips():
-            #print ("%s" % (chip,))
-            #print (f"Looking for {chipName}")
-            if str(chip) == chipName:
-                #print('%s at %s' % (chip, chip.adapter_name))
-                for feature in chip:
-                    if feature.label == sensorName:
-                        # sensor values are rounded to the nearest 10th to prevent jitter
-                        return round(feature.get_value(), 1)
+            chipName = str(chip)
+            for feature in chip:
+                if (chipName, feature.label) in wanted:
+                    features[chipName+"/"+feature.label] = feature
     except Exception as err:
-        print("Problem reading sensors")
+        print("Problem resolving sensors")
+    for chipName, sensorName in wanted:
+        if chipName+"/"+sensorName not in features:
+            print(f"Sensor {chipName}/{sensorName} not found")
+    sys.stdout.flush()
+
+
+""" Rescan the hardware, e.g. when a chip disappeared or came back """
+
+
+def reresolveSensors():
+    print("Rescanning sensors")
+    sensors.cleanup()
+    sensors.init()
+    resolveSensors()
+
+
+""" Read all the resolved features in one go and return them by chip/sensor. Failed reads are None """
+
+
+def readSensors():
+    values = {}
+    for key, feature in features.items():
+        try:
+            # sensor values are rounded to the nearest 10th to prevent jitter
+            values[key] = round(feature.get_value(), 1)
+        except Exception as err:
+            print(f"Problem reading sensor {key}")
+            values[key] = None
+    return values
 
 
 """ Initialize the MQTT object and connect to the server """
@@ -63,24 +97,43 @@ if conf['mqttUser'] and conf['mqttPass']:
     client.username_pw_set(username=conf['mqttUser'], password=conf['mqttPass'])
 client.connect(conf['mqttServer'], conf['mqttPort'], 60)
 client.loop_start()
+resolveSensors()
 
 """ Do an infinite loop reading temperatures and sending them via MQTT """
 
 while (True):
+    values = readSensors()
+    if (len(features) < len(conf['sensors']) or None in values.values()) and \
+            time.time() - lastResolve >= conf.get('rescan', 60):
+        # some sensors are missing or failing, see if the hardware changed
+        reresolveSensors()
+        values = readSensors()
+
     for sensor in conf['sensors']:
-        newValue = readSensor(sensor['chip'], sensor['sensor'])
+        key = sensor['chip']+"/"+sensor['sensor']
+        newValue = values.get(key)
         if newValue is None:
-            print(f"Ignoring incorrect sensor reading for sensor['name'] - sensor['chip']: sensor['sensor']")
-            time.sleep(conf['sleep'])
+            print(f"Ignoring incorrect sensor reading for {sensor['name']} - {key}")
+            continue
+        # publish the output value via MQTT only if it moved by at least the deadband,
+        # or if it wasn't published for longer than the heartbeat interval.
+        # Compare in integer tenths (the resolution of the readings), float differences like 21.4 - 21.2 aren't exact
+        deadband = round(sensor.get('deadband', conf.get('deadband', 0)) * 10)
+        heartbeat = sensor.get('heartbeat', conf.get('heartbeat', 0))
+        now = time.time()
+        delta = abs(round(newValue * 10) - round(oldValue.get(key, 0) * 10))
+        if key not in oldValue:
+            print(f"Sensor {key} first reading %.5f" % float(newValue))
+        elif delta and delta >= deadband:
+            print(f"Sensor {key} changed from %.5f to %.5f" % (float(oldValue[key]), float(newValue)))
+        elif heartbeat and now - lastPublished[key] >= heartbeat:
+            print(f"Sensor {key} heartbeat %.5f" % float(newValue))
+        else:
             continue
-        # publish the output value via MQTT if the value has changed
-        if sensor['chip']+"/"+sensor['sensor'] not in oldValue:
-            oldValue[sensor['chip']+"/"+sensor['sensor']] = 0
-        if oldValue[sensor['chip']+"/"+sensor['sensor']] != newValue:
-            print(f"Sensor {sensor['chip']}/{sensor['sensor']} changed from %.5f to %.5f" % (float(oldValue[sensor['chip']+"/"+sensor['sensor']]), float(newValue)))
         sys.stdout.flush()
         client.publish(sensor['mqttTopic'], newValue, 0, conf['mqttPersistent'])
-        oldValue[sensor['chip']+"/"+sensor['sensor']] = newValue
+        oldValue[key] = newValue
+        lastPublished[key] = now
     
     # sleep for a while
 #    print("Sleeping...")
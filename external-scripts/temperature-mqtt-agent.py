@@ -1,14 +1,19 @@
 #!/usr/bin/python
 import paho.mqtt.client as mqtt
-import re
 import time
 import sys
 import yaml
+import glob
+import os
+import json
+import w1_therm
+from multiprocessing.pool import ThreadPool
 
 # Prerequisites:
 # * pip: sudo apt-get install python-pip
 # * paho-mqtt: pip install paho-mqtt
 # * python-yaml: sudo apt-get install python-yaml
+# * w1_therm.py from this directory, installed next to this script
 
 # Configuration file goes in /etc/temperature-mqtt-agent.yaml and should contain your mqtt broker details
 
@@ -18,8 +23,11 @@ import yaml
 #  sudo systemctl start temperature-mqtt-agent
 
 #filename = '/sys/devices/w1_bus_master1/28-0516a1db5dff/w1_slave'
-valid = False
-oldValue = 0
+w1Root = '/sys/devices'
+# last published value, per probe
+oldValue = {}
+# read errors and retry schedule, per probe
+health = {}
 
 """ Parse and load the configuration file to get MQTT credentials """
 
@@ -37,34 +45,130 @@ def parseConfig():
             sys.exit(1)
 
 
-""" Read temperature from sysfs and return it as a string """
+""" Read temperature from sysfs and return it in millidegrees """
+
+
+def readTemperature(filename):
+    try:
+        temperature = w1_therm.read(filename)
+    except (IOError, OSError) as exc:
+        # the probe went away
+        print(exc)
+        return None
+    if temperature is None:
+        # bad CRC
+        return None
+    # ignore extreme temperatures
+    if temperature < -10000 or temperature > 45000:
+        print("Read %s" % w1_therm.degrees(temperature))
+        return None
+    return temperature
 
 
-def readTemperature():
-    valid = False
-    with open(filename) as f:
-        for line in f:
-            if re.search('crc=.*YES', line):
-                # the CRC is valid. Continue processing
-                valid = True
-                continue
-            if valid and re.search('t=[0-9]+', line):
-                # extract the temperature value
-                temperature = re.search('t=([0-9]+)', line)
-                # convert to degrees celsius and keep 1 digit of accuracy
-                output = "%.1f" % (float(temperature.group(1)) / 1000.0)
-                # ignore extreme temperatures
-                if float(output) < -10.0 or float(output) > 45.0:
-                    print("Read %f" % float(output))
-                    return None
+""" Find the probes to read and their MQTT topics: {w1_slave path: topic} """
 
-#                print("Temperature is "+str(output))
-                return output
+
+def discoverProbes():
+    probes = {}
+    masters = conf.get('busMasters', ['w1_bus_master1'])
+    if 'sensor' in conf:
+        # single probe configuration
+        probes[w1Root+'/'+masters[0]+'/'+conf['sensor']+'/w1_slave'] = conf['mqttTopic']
+    for sensor, topic in (conf.get('sensors') or {}).items():
+        for master in masters:
+            if os.path.isdir(w1Root+'/'+master+'/'+sensor):
+                probes[w1Root+'/'+master+'/'+sensor+'/w1_slave'] = topic
+    if conf.get('discover'):
+        # every DS18B20 (family 28) on the bus masters, published under mqttTopicPrefix
+        for master in masters:
+            for path in sorted(glob.glob(w1Root+'/'+master+'/28-*')):
+                filename = path+'/w1_slave'
+                if filename not in probes:
+                    probes[filename] = conf.get('mqttTopicPrefix', 'ha/w1')+'/'+os.path.basename(path)
+    for filename, topic in probes.items():
+        print("Reading "+filename+" into "+topic)
+    sys.stdout.flush()
+    return probes
+
+
+""" Start one conversion on every probe of a bus master. Returns False if the kernel doesn't support it """
+
+
+def bulkConvert(master):
+    trigger = w1Root+'/'+master+'/therm_bulk_read'
+    if not os.path.exists(trigger):
+        return False
+    try:
+        with open(trigger, 'w') as f:
+            f.write('trigger\n')
+        # -1 means a conversion is in progress, the usual DS18B20 conversion takes 750ms
+        for i in range(20):
+            with open(trigger) as f:
+                if f.read().strip() != '-1':
+                    return True
+            time.sleep(0.1)
+    except (IOError, OSError) as exc:
+        print("Bulk read failed on "+master+": "+str(exc))
+    return False
+
+
+""" Read all the probes: one bulk conversion per bus master where possible, the reads in parallel """
+
+
+def readProbes(probes):
+    if conf.get('bulkRead', True):
+        for master in conf.get('busMasters', ['w1_bus_master1']):
+            bulkConvert(master)
+    filenames = list(probes)
+    # each w1_slave read can block for a whole conversion, so do them concurrently
+    return dict(zip(filenames, pool.map(readTemperature, filenames)))
+
+
+""" Count a failed read and back off exponentially before retrying the probe, up to retryMax seconds """
+
+
+def recordError(filename, now):
+    state = health[filename]
+    state['errors'] += 1
+    state['totalErrors'] += 1
+    delay = min(conf.get('retryDelay', 1) * 2 ** (state['errors'] - 1), conf.get('retryMax', 300))
+    state['nextRead'] = now + delay
+    print("Ignoring incorrect temperature reading from %s (%d in a row), retrying in %.1fs" % (filename, state['errors'], delay))
+    publishHealth(filename)
+
+
+""" A good read resets the error counter, the probe goes back to the regular schedule """
+
+
+def recordSuccess(filename, now):
+    state = health[filename]
+    state['nextRead'] = now + conf['sleep']
+    if state['errors'] or not state['published']:
+        if state['errors']:
+            print("Probe %s recovered after %d errors" % (filename, state['errors']))
+        state['errors'] = 0
+        publishHealth(filename)
+
+
+""" Publish the probe health on <topic>/health, only when it changes """
+
+
+def publishHealth(filename):
+    state = health[filename]
+    payload = json.dumps({'status': 'error' if state['errors'] else 'ok',
+                          'errors': state['errors'],
+                          'total_errors': state['totalErrors']})
+    sys.stdout.flush()
+    client.publish(probes[filename]+conf.get('healthSuffix', '/health'), payload, 0, conf['mqttPersistent'])
+    state['published'] = True
 
 
 """ Initialize the MQTT object and connect to the server """
 parseConfig()
-filename='/sys/devices/w1_bus_master1/'+conf['sensor']+'/w1_slave'
+# can be pointed to a fake sysfs tree for testing
+w1Root = conf.get('w1Root', w1Root)
+probes = discoverProbes()
+pool = ThreadPool(max(1, min(len(probes), conf.get('threads', 8))))
 client = mqtt.Client()
 if conf['mqttUser'] and conf['mqttPass']:
     client.username_pw_set(username=conf['mqttUser'], password=conf['mqttPass'])
@@ -73,17 +177,29 @@ client.loop_start()
 
 """ Do an infinite loop reading temperatures and sending them via MQTT """
 
+for filename in probes:
+    health[filename] = {'errors': 0, 'totalErrors': 0, 'nextRead': 0, 'published': False}
+
 while (True):
-    newValue = readTemperature()
-    if newValue is None:
-        print("Ignoring incorrect temperature reading")
-        continue
-    # publish the output value via MQTT if the value has changed
-    if oldValue != newValue:
-        print("Temperature changed from %.1f to %.1f" % (float(oldValue), float(newValue)))
-        sys.stdout.flush()
-        client.publish(conf['mqttTopic'], newValue, 0, conf['mqttPersistent'])
-        oldValue = newValue
-    # sleep for a while
+    # only the probes that are due: failing probes wait for their backoff to run out
+    now = time.time()
+    due = [filename for filename in probes if health[filename]['nextRead'] <= now]
+    values = readProbes(due) if due else {}
+    now = time.time()
+    for filename, newValue in values.items():
+        topic = probes[filename]
+        if newValue is None:
+            recordError(filename, now)
+            continue
+        recordSuccess(filename, now)
+        # publish the output value via MQTT if the value has changed, with 1 digit of accuracy
+        output = w1_therm.degrees(newValue)
+        if oldValue.get(filename) != output:
+            print("Temperature on %s changed from %s to %s" % (topic, oldValue.get(filename, '0.0'), output))
+            sys.stdout.flush()
+            client.publish(topic, output, 0, conf['mqttPersistent'])
+            oldValue[filename] = output
+    # sleep until the next probe is due, never less than a tenth of a second
 #    print("Sleeping...")
-    time.sleep(conf['sleep'])
+    nextRead = [state['nextRead'] for state in health.values()] + [now + conf['sleep']]
+    time.sleep(max(0.1, min(nextRead) - time.time()))
@@ -1,24 +1,115 @@
 #!/usr/bin/python
-import re
+import errno
+import fcntl
+import os
+import stat
+import tempfile
+import time
+import w1_therm
+
+# Prerequisites:
+# * w1_therm.py from this directory, installed next to this script
+# * a cache directory writable only by the CGI user, e.g. with systemd-tmpfiles (/etc/tmpfiles.d/temperature.conf):
+#   d /run/temperature 0700 www-data www-data
+#   Set TEMPERATURE_CACHE_DIR in the web server environment to use another one
 
 filename = '/sys/devices/w1_bus_master1/28-05168661eaff/w1_slave'
-valid = False
+# the last reading is shared by all the CGI processes, a new conversion is started only when it is older than maxAge
+# it lives in a private directory rather than /tmp, where anyone could plant a symlink at a predictable name
+cacheDir = os.environ.get('TEMPERATURE_CACHE_DIR', '/run/temperature')
+cacheFile = os.path.join(cacheDir, 'temperature.cache')
+lockFile = os.path.join(cacheDir, 'temperature.lock')
+maxAge = 10
+
+""" Create the cache directory if needed, return True if it is a real directory only this user can write to """
+
+
+def checkCacheDir():
+    try:
+        os.mkdir(cacheDir, 0o700)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            return False
+    try:
+        st = os.lstat(cacheDir)
+    except OSError:
+        return False
+    return (stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and
+            not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH))
+
+""" Read the probe and return the formatted temperature, or None if the read failed (bad CRC, missing probe) """
+
+
+def readProbe():
+    try:
+        temperature = w1_therm.read(filename)
+    except (IOError, OSError):
+        return None
+    if temperature is None:
+        return None
+    return w1_therm.degrees(temperature)
+
+
+""" Return the cached reading and its age in seconds, or (None, None) if there is none """
+
+
+def readCache():
+    try:
+        with open(cacheFile) as f:
+            return f.read().strip(), time.time() - os.fstat(f.fileno()).st_mtime
+    except (IOError, OSError):
+        return None, None
 
+
+""" Read the probe and replace the cached reading. A failed read (bad CRC, missing probe) keeps the previous one """
+
+
+def updateCache(output, age):
+    temperature = readProbe()
+    if temperature is None:
+        # leave the cache and its mtime alone, so the next request tries again
+        return output, age
+    # write to a new temporary file and rename it, readers never see a partial file
+    fd, tmpFile = tempfile.mkstemp(dir=cacheDir, prefix='.temperature.')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(temperature + '\n')
+        os.rename(tmpFile, cacheFile)
+    except (IOError, OSError):
+        os.unlink(tmpFile)
+        raise
+    return temperature, 0
+
+
+""" Serve the cached reading if fresh. Otherwise only one process reads the bus, the others get the previous reading """
+
+
+def getTemperature():
+    if not checkCacheDir():
+        # don't trust the cache, every request reads the probe
+        return readProbe(), None
+    output, age = readCache()
+    if age is not None and age < maxAge:
+        return output, age
+    with open(lockFile, 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError):
+            if age is not None:
+                # a conversion is already running, don't queue behind it
+                return output, age
+            # nothing cached yet, wait for the running conversion
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        # someone may have refreshed the cache while we were waiting for the lock
+        output, age = readCache()
+        if age is not None and age < maxAge:
+            return output, age
+        return updateCache(output, age)
+
+
+output, age = getTemperature()
 print "Content-Type: text/plain"
+print "Cache-Control: max-age=%d" % (max(0, int(maxAge - age)) if age is not None else 0)
 print ""
-
-# execute the command and parse each line of output
-with open(filename) as f:
-    for line in f:
-    
-        if re.search('crc=.*YES', line):
-            # the CRC is valid. Continue processing
-            valid = True
-            continue
-
-        if valid and re.search('t=[0-9]+', line):
-            # extract the temperature value
-            temperature = re.search('t=([0-9]+)', line)
-            # convert to degrees celsius and keep 1 digit of accuracy
-            output = "%.1f" % (float(temperature.group(1))/1000.0)
-            print output
+if output:
+    print output
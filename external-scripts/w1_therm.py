@@ -0,0 +1,42 @@
+#!/usr/bin/python
+# Parser for the w1_slave file of 1-Wire temperature probes (DS18B20 & co), shared by the temperature scripts.
+# Install it next to the scripts (e.g. /usr/local/bin/w1_therm.py).
+#
+# The kernel w1_therm driver returns two lines:
+#   72 01 4b 46 7f ff 0e 10 57 : crc=57 YES
+#   72 01 4b 46 7f ff 0e 10 57 t=23125
+# The file is read once and parsed in a single pass with plain string operations.
+# Temperatures are integer millidegrees celsius, callers format them only for output.
+
+
+def parse(data):
+    """ Return the temperature in millidegrees from the w1_slave contents, or None if the CRC is bad """
+    # the CRC verdict ends the first line, the temperature ends the second one
+    end = data.find('\n')
+    if end < 3 or data[end - 3:end] != 'YES':
+        return None
+    start = data.find('t=', end)
+    if start < 0:
+        return None
+    try:
+        return int(data[start + 2:].strip())
+    except ValueError:
+        return None
+
+
+def read(filename):
+    """ Read the probe (a conversion can take up to 750ms) and return its temperature in millidegrees, or None.
+        IOError/OSError is raised if the probe is gone """
+    with open(filename) as f:
+        return parse(f.read())
+
+
+def tenths(millidegrees):
+    """ Round millidegrees to integer tenths of a degree, the resolution published by the scripts """
+    return (millidegrees + 50) // 100
+
+
+def degrees(millidegrees):
+    """ Format millidegrees as degrees with 1 digit of accuracy """
+    value = tenths(millidegrees)
+    return "%s%d.%d" % ('-' if value < 0 else '', abs(value) // 10, abs(value) % 10)